@@ -95,3 +95,15 @@ else:
             file_age = (time_now - creation_time).days
             if file_age >= req_age:
                 print(f"{item} is {file_age} old")
+
+# For large trees, see oldfiles_12.py: it searches recursively, needs one stat() per file instead of two and
+# compares plain timestamps instead of creating datetime objects for every file.
+import oldfiles_12
+
+now = datetime.datetime.now().timestamp()
+for fullpath, timestamp in oldfiles_12.find_old_files(path, req_age, mode='ctime'):
+    print(f"{fullpath} is {int((now - timestamp) // oldfiles_12.SECONDS_PER_DAY)} days old")
+
+# Instead of printing every old file, agereport_12.py summarises a whole tree (age buckets, percentiles and the
+# directories holding the most old data), using NumPy for the arithmetic. From a terminal:
+# python agereport_12.py <path> <req_age>
@@ -10,6 +10,11 @@ import os
 # Note the behaviour:
 out = os.system("ls -lthr")  # prints the command output, but returns the exit code!
 print(f"out: {out}")
+# os.system always starts a shell first. spawn_13.py starts the command directly with os.posix_spawn and only uses
+# a shell when the command needs one (e.g. for $HOME, pipes or wildcards):
+# import spawn_13
+# spawn_13.run("ls -lthr")  # no shell needed
+# spawn_13.run("ls $HOME")  # run through /bin/sh
 
 """
 The store the output as a variable, we use the 'subprocess' module
@@ -35,6 +40,15 @@ print(f'The output is:\n{out}')
 print(f'The error is {err}')  # No error because the process has executed successfully
 print(f'\nThe output as a list:\n{out.splitlines()}')  # The output will be converted to a list
 
+# Careful: wait() before communicate() can deadlock if the command prints more than the pipe can hold (~64 KB):
+# the command waits for us to read, while we wait for it to finish. communicate() alone (it waits as well) is safe.
+# To run many commands at the same time, with timeouts, see executor_13.py:
+import executor_13
+
+for result in executor_13.run_commands(['ls -lthr', ['bash', '--version']], limit=8, timeout=10):
+    print(f'{result.cmd}: return code {result.returncode}, {len(result.stdout.splitlines())} lines in '
+          f'{result.duration:.3f} s')
+
 print("PRACTICE".center(50, "-"))
 # Find the bash version using the subprocess module
 bash_pr = subprocess.Popen(['bash', '--version'], shell=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
@@ -52,6 +66,16 @@ if rc == 0:
 else:
     print('The command has failed')
 
+# The same with stream_13.py: the lines are read as bash prints them, and 'break' stops (kills) the command, so for
+# commands with a huge output we neither wait for the end nor keep the whole output in memory
+import stream_13
+
+for string in stream_13.iter_lines(['bash', '--version']):
+    if 'version' in string:
+        pos = string.find('version')
+        print(string[pos + len(' version'):string.find('(', pos)])
+        break
+
 print("PRACTICE 2".center(50, "-"))
 # Find the bash version using the subprocess module
 java_pr = subprocess.Popen(['java', '-version'], shell=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
@@ -68,3 +92,19 @@ if rc == 0:
             break
 else:
     print('The command has failed')
+
+# Checking the versions of many tools over and over? versions_13.py remembers each version together with the identity
+# of the executable (path, inode, size, mtime), and only runs the tools which have changed - all at the same time.
+import versions_13
+
+print(versions_13.tool_versions(['bash', 'java']))
+
+# To run a whole list of commands and see which ones are slow (and whether they are busy or just waiting), see
+# batch_13.py. It records wall time, CPU time and peak memory of every command:
+# python batch_13.py commands.txt report.json
+
+# To chain commands like 'cmd1 | cmd2 | cmd3', see pipeline_13.py: the commands are connected directly with OS pipes,
+# so the data does not have to go through Python in between
+import pipeline_13
+
+print((pipeline_13.Command('ls', '-lthr') | pipeline_13.Command('wc', '-l')).run().decode())
@@ -28,6 +28,13 @@ fo.write('This is the 4th line.\n')
 # print(fo.read())  # not allowed in 'w' mode
 fo.close()
 
+# For writing millions of lines, see linewriter_14.py: it encodes the lines in big batches and writes them out in
+# large blocks
+import linewriter_14
+
+with linewriter_14.LineWriter('newfile_many_lines.txt') as writer:
+    writer.write_lines(f'This is line number {i}.' for i in range(1000))
+
 print("-".center(50, "-"))
 fo = open('newfile.txt', 'r+')  # r+: read and write
 # pointer is at the beginning of the file
@@ -50,6 +57,8 @@ print(f'a+ first read:\n{fo.read()}')  # Prints nothing because the pointer is a
 fo.writelines(['This is the 9th line.\n', 'This is the 10th line.\n'])
 fo.seek(0)  # Bring the pointer to the top again
 print(f'a+ second read:\n{fo.read()}')
+# To see only what has been appended since the last read (e.g. for a log file which keeps growing), there's no need to
+# go back to the top: see follow_14.py, which remembers where it stopped and waits for new lines like 'tail -F'
 
 fo.seek(0)
 print(f'a+ second read as a list:\n{fo.readlines()}')
@@ -58,16 +67,28 @@ fo.seek(10)
 print(f'Read from current pointer position:\n{fo.readline()}')  # Read line from the current pointer position
 fo.close()
 
+# seek() jumps to a byte position, not to a line. To read e.g. lines 500-504 of a huge file without reading all the
+# lines before them, see lineindex_14.py: it remembers where every line starts (in newfile_many_lines.txt.lidx)
+import lineindex_14
+
+with lineindex_14.LineIndex('newfile_many_lines.txt') as index:
+    print(f'{len(index)} lines, lines 500-504:\n{index.lines(500, 505)}')
+
 # print(fo.tell())  # Get pointer position
 
 print("-".center(50, "-"))
 # Copy the contents of a file to another one
-loremipsum = open('sampletext.txt', 'r')
-readlorem = loremipsum.readlines()[0]
-loremipsum.close()
+# loremipsum = open('sampletext.txt', 'r')
+# readlorem = loremipsum.readlines()[0]  # reads the whole file into a list, just to keep the first line
+# loremipsum.close()
+# fo = open('newfile.txt', 'a+')
+# fo.write(readlorem)
 
-fo = open('newfile.txt', 'a+')
-fo.write(readlorem)
-fo.seek(0)
+# concat_14.py copies lines (or bytes) straight from one file to the other, in chunks, so even multi-GB files
+# never have to fit in memory
+import concat_14
+
+concat_14.copy_lines('sampletext.txt', 'newfile.txt', 0, 1, append=True)  # the first line of sampletext.txt
+fo = open('newfile.txt', 'r')
 print(f'File with appended loremipsum:\n{fo.read()}')
 fo.close()
@@ -20,6 +20,24 @@ for each in content:  # has to be included before close()
 print(f"Content as a list: {list(content)}")
 fo.close()
 
+# For files too big for list(content), csvstream_15.py reads the rows one by one, keeps only the columns we ask for
+# and converts them (here: the age to an int)
+import csvstream_15
+
+for person in csvstream_15.read_csv(req_file, columns=['Name', 'Age'], types={'Age': int}, record='named'):
+    print(person.Name, person.Age)
+
+# csv.reader only uses one CPU core. csvparallel_15.py cuts a big file into byte ranges (never in the middle of a
+# record, even if a quoted field contains newlines) and parses them in separate processes:
+# import csvparallel_15
+# rows = list(csvparallel_15.read_rows(req_file, columns=['Name', 'Age'], types={'Age': int}))
+
+# For number crunching, csvnumpy_15.py loads columns as NumPy arrays (Gender as codes 0, 1 plus the list ['F', 'M'])
+# and caches them as .npy files, so analysing the same file again doesn't parse the text again:
+# import csvnumpy_15
+# table = csvnumpy_15.load(req_file, numeric=['Age'], categorical=['Gender'])
+# print(table['Age'][table['Gender'] == table.code('Gender', 'F')].mean())
+
 print("-".center(50, "-"))
 fo = open(req_file.replace('csvdata', 'csvdata2'), 'r')
 content = csv.reader(fo, delimiter='|')  # Change the delimiter
@@ -94,3 +112,10 @@ fo.seek(0)
 print(fo.read())
 
 fo.close()
+
+# For exports of millions of rows, csvwriter_15.py writes the rows in big batches and can gzip them on the fly, in a
+# background thread, so the rows are compressed while the next ones are being generated:
+# import csvwriter_15
+# with csvwriter_15.CSVWriter(filename + '.gz', compression='gzip', delimiter='|') as writer:
+#     writer.writerows([['Name', 'Gender', 'Age'], ['Maria', 'F', '46'], ['John', 'M', '34']])
+# print(f'{writer.rows_per_second:.0f} rows/s')
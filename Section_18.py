@@ -16,6 +16,16 @@ def my_function(cmd1, cmd2):
 
 # my_function('clear', 'ls')
 
+# my_function runs the two commands one after the other, with fixed pauses in between. If the commands do not depend
+# on each other, they can just as well run at the same time. dag_18.py runs a whole graph of commands this way,
+# starting every command as soon as the ones it depends on have finished:
+# import dag_18
+# graph = dag_18.TaskGraph()
+# graph.add('first', 'clear')
+# graph.add('second', 'ls')
+# graph.add('third', 'ls -l', deps=['first', 'second'])
+# print(graph.run())
+
 # Another example - a function with no arguments:
 print("-".center(50, "-"))
 
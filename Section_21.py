@@ -29,3 +29,28 @@ dstdir = '/home/jkrys/Desktop/Programming/Python for Automation/Exercises/walkdi
 
 shutil.copytree(srcdir, dstdir)  # copy a directory tree recursively
 shutil.rmtree(dstdir)  # remove a directory tree
+
+# For big trees with many small files, copytree_21.py copies the files in parallel (and inside the kernel where
+# possible), keeping the copy2 metadata. It also reports the throughput:
+import copytree_21
+
+stats = copytree_21.parallel_copytree(srcdir, dstdir)
+print(f"Copied {stats['files']} files at {stats['mb_per_second']:.1f} MB/s")
+
+# Similarly, rmtree_21.py deletes a big tree in parallel, much faster than shutil.rmtree:
+import rmtree_21
+
+stats = rmtree_21.parallel_rmtree(dstdir)
+print(f"Removed {stats['files']} files in {stats['seconds']:.2f} s")
+
+# For backups which are repeated regularly, mirror_21.py only copies what has changed since the last run and deletes
+# what has been removed, keeping a manifest of the backup in dstdir:
+# python mirror_21.py <srcdir> <dstdir> [--hash]
+
+# To keep many backups of the same tree without storing unchanged data again and again, see dedup_21.py:
+# python dedup_21.py backup <store> <srcdir>
+# python dedup_21.py restore <store> <snapshot name> <dstdir>
+
+# copyfileobj above works in text mode with a fixed buffer size. fastcopy_21.py has a binary version which sizes its
+# buffer for the file and never allocates memory per chunk, plus a benchmark of all the ways of copying a file:
+# python fastcopy_21.py [largest size in MB]
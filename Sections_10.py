@@ -7,6 +7,8 @@ import os
 import platform
 import sys
 
+import rmtree_21
+
 # print(help(os))
 print(os.sep)  # path separator used by the system
 
@@ -95,7 +97,9 @@ print("os.walk(path)".center(120, "-"))
 
 walk_path = "walkdirectory"
 if os.path.exists(walk_path):
-    os.system(f"rm -r {walk_path}")  # the point here is to remove the subdirectories as well
+    # os.system(f"rm -r {walk_path}") would also work, but it starts a shell (which breaks on paths with spaces)
+    # and deletes one file at a time. rmtree_21.py deletes in parallel, without a shell:
+    rmtree_21.parallel_rmtree(walk_path)  # the point here is to remove the subdirectories as well
     os.mkdir(walk_path)
 
 print(os.walk(walk_path))
@@ -122,3 +126,27 @@ for pathh, dirs, files in os.walk(start_dir):
     for file in files:
         if req_file in file:
             print(os.path.join(pathh, file))
+
+# On large (e.g. network) file systems, the same search is much faster with the parallel scandir walker
+# from walker_10.py. Matches are printed as soon as they are found, while the rest of the tree is still being listed.
+import walker_10
+
+for match in walker_10.find_files(req_file, start_dir):
+    print(match)
+
+# If we search the same tree many times, we can list it only once and save an index of the file names
+# (see fileindex_10.py). Afterwards, a search only looks at the files which can match, and index.refresh() lists
+# again only the directories which have changed since the index was built.
+"""
+import fileindex_10
+
+index = fileindex_10.FileIndex.build(start_dir, 'filenames.idx')  # once
+index = fileindex_10.FileIndex('filenames.idx')  # every time after that
+index.refresh()
+for match in index.search(req_file):
+    print(match)
+index.close()
+"""
+
+# On Linux, the index can also be kept up to date continuously with inotify (see watcher_10.py), so that even
+# index.refresh() is not needed. From a terminal: python watcher_10.py filenames.idx
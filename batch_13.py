@@ -0,0 +1,117 @@
+"""
+A batch runner with per-command timing and resource usage, building on subprocess.Popen from Section_13.py
+
+To find out why a batch of automation commands is slow, we need more than the wall-clock time of each one:
+- user time: CPU time spent running the command's own code
+- sys time: CPU time spent in the kernel on its behalf (file system, network, starting processes, ...)
+- max RSS: the most memory it has used at any one time (on Linux, this can include the moment between fork and exec,
+  when the child is still a copy of this Python process - so small values are just a floor)
+A long wall time with little CPU time means the command is mostly waiting (for disk, network, locks...).
+
+Popen.wait() only gives us the exit code. os.wait4() waits for the same child, but also returns its resource usage
+('rusage'), so we wait for each child with os.wait4 ourselves.
+https://docs.python.org/3/library/os.html#os.wait4
+https://man7.org/linux/man-pages/man2/getrusage.2.html
+
+The manifest is either a text file with one (shell) command per line, or a JSON list whose items are command strings
+or objects like {"name": "backup", "cmd": "rsync ...", "timeout": 600, "cwd": "/tmp"}.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import executor_13
+
+def load_manifest(path):
+    with open(path) as fo:
+        if path.endswith('.json'):
+            items = json.load(fo)
+        else:
+            items = [line.strip() for line in fo if line.strip() and not line.lstrip().startswith('#')]
+    jobs = []
+    for i, item in enumerate(items):
+        job = {'cmd': item} if isinstance(item, (str, list)) else dict(item)
+        job.setdefault('name', f'cmd{i + 1}')
+        jobs.append(job)
+    return jobs
+
+def run_job(job, log_dir=None, default_timeout=None):
+    """
+    Run one job from the manifest, wait for it with os.wait4 and return its record:
+    name, cmd, returncode, wall, user, sys (in seconds), maxrss_kb and timed_out.
+    """
+    cmd = job['cmd']
+    timeout = job.get('timeout', default_timeout)
+    if log_dir is not None:
+        stdout = open(os.path.join(log_dir, f"{job['name']}.out"), 'wb')
+        stderr = open(os.path.join(log_dir, f"{job['name']}.err"), 'wb')
+    else:
+        stdout = stderr = subprocess.DEVNULL
+    record = {'name': job['name'], 'cmd': cmd, 'returncode': None, 'wall': 0.0, 'user': 0.0, 'sys': 0.0,
+              'maxrss_kb': 0, 'timed_out': False}
+    start = time.perf_counter()
+    try:
+        proc = subprocess.Popen(cmd, shell=isinstance(cmd, str), stdout=stdout, stderr=stderr, cwd=job.get('cwd'),
+                                start_new_session=True)
+    except OSError as e:
+        record['error'] = str(e)
+        return record
+    finally:
+        if log_dir is not None:
+            stdout.close()  # the child has its own copies
+            stderr.close()
+
+    timer = None
+    if timeout is not None:
+        def on_timeout():
+            record['timed_out'] = True
+            executor_13.kill_group(proc)
+        timer = threading.Timer(timeout, on_timeout)
+        timer.start()
+    try:
+        _, status, usage = os.wait4(proc.pid, 0)
+    finally:
+        if timer is not None:
+            timer.cancel()
+    proc.returncode = os.waitstatus_to_exitcode(status)  # tell Popen we have already waited for it
+    record.update(returncode=proc.returncode, wall=time.perf_counter() - start, user=usage.ru_utime,
+                  sys=usage.ru_stime, maxrss_kb=usage.ru_maxrss if sys.platform != 'darwin' else usage.ru_maxrss // 1024)
+    return record
+
+def run_batch(jobs, workers=8, log_dir=None, timeout=None):
+    # Run all jobs on a pool of worker threads; returns the records in the order of the manifest
+    if log_dir is not None:
+        os.makedirs(log_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda job: run_job(job, log_dir, timeout), jobs))
+
+def summary_table(records):
+    lines = [f"{'name':<20}{'rc':>6}{'wall s':>10}{'user s':>10}{'sys s':>10}{'cpu %':>8}{'max RSS MB':>12}  command"]
+    for r in sorted(records, key=lambda r: r['wall'], reverse=True):
+        cpu = 100 * (r['user'] + r['sys']) / r['wall'] if r['wall'] else 0.0
+        rc = 'T/O' if r['timed_out'] else ('ERR' if r['returncode'] is None else r['returncode'])
+        cmd = r['cmd'] if isinstance(r['cmd'], str) else ' '.join(r['cmd'])
+        lines.append(f"{r['name']:<20}{rc:>6}{r['wall']:>10.3f}{r['user']:>10.3f}{r['sys']:>10.3f}{cpu:>8.0f}"
+                     f"{r['maxrss_kb'] / 1024:>12.1f}  {cmd}")
+    total_user = sum(r['user'] for r in records)
+    total_sys = sum(r['sys'] for r in records)
+    failed = sum(1 for r in records if r['returncode'] != 0)
+    lines.append(f'{len(records)} commands, {failed} failed, total user {total_user:.3f} s, sys {total_sys:.3f} s')
+    return '\n'.join(lines)
+
+if __name__ == '__main__':
+    # python batch_13.py <manifest> [report.json] [workers]
+    jobs = load_manifest(sys.argv[1])
+    start = time.perf_counter()
+    records = run_batch(jobs, workers=int(sys.argv[3]) if len(sys.argv) > 3 else 8)
+    elapsed = time.perf_counter() - start
+    print(summary_table(records))
+    print(f'Wall time of the whole batch: {elapsed:.3f} s')
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], 'w') as fo:
+            json.dump({'wall': elapsed, 'commands': records}, fo, indent=1)
@@ -0,0 +1,133 @@
+"""
+Copying parts of files into another file with constant memory (the 'copy the contents of a file' part of Section_14.py)
+
+readlines()[0] reads the whole file into a list just to keep one line, and fo.write(fi.read()) holds a whole file in
+memory. For multi-GB files, both are a problem. Here, data is copied in fixed-size chunks:
+- byte ranges are copied with os.copy_file_range, which moves the data inside the kernel (and on btrfs/XFS/NFS 4.2
+  may not even copy the blocks). If that's not possible (e.g. between different file systems on older kernels),
+  os.sendfile, and then a pread/write loop with one reused buffer, are used instead (fileutil.copy_with_fallback,
+  shared with copytree_21.py)
+- line ranges are first turned into byte ranges by counting newlines chunk by chunk; only one chunk is in memory
+  at a time. (With a line index from lineindex_14.py, the line positions are looked up instead.)
+
+    concat('merged.txt', ['shard1.txt', ('shard2.txt', 100, 5000), 'shard3.txt'])   # whole files and byte ranges
+    copy_lines('sampletext.txt', 'newfile.txt', 0, 1, append=True)                  # the first line
+"""
+
+import os
+import sys
+
+import fastcopy_21
+import fileutil
+
+CHUNK = 8 * 1024 * 1024  # bytes per system call
+
+def _copy_file_range(fd_in, fd_out, start, length):
+    copied = 0
+    while copied < length:
+        n = os.copy_file_range(fd_in, fd_out, min(length - copied, CHUNK), start + copied)
+        if n == 0:
+            break  # end of the source file
+        copied += n
+    return copied
+
+def _sendfile(fd_in, fd_out, start, length):
+    copied = 0
+    while copied < length:
+        n = os.sendfile(fd_out, fd_in, start + copied, min(length - copied, CHUNK))
+        if n == 0:
+            break
+        copied += n
+    return copied
+
+def _pread(fd_in, fd_out, start, length):
+    buf = bytearray(fastcopy_21.buffer_size_for(min(length, CHUNK)))
+    view = memoryview(buf)
+    copied = 0
+    while copied < length:
+        n = os.preadv(fd_in, [view[:min(len(buf), length - copied)]], start + copied)
+        if n == 0:
+            break
+        pos = 0
+        while pos < n:
+            pos += os.write(fd_out, view[pos:n])
+        copied += n
+    return copied
+
+def copy_range(fd_in, fd_out, start=0, length=None):
+    """
+    Copy length bytes (everything up to the end if None) from position start of fd_in to the current position of
+    fd_out. fd_in's own position is not used or changed. Returns the number of bytes copied.
+    """
+    if length is None:
+        length = max(0, os.fstat(fd_in).st_size - start)
+    return fileutil.copy_with_fallback((_copy_file_range, _sendfile), _pread, fd_out, fd_in, fd_out, start, length)
+
+def line_offsets(path, first, last, index=None):
+    """
+    The byte range (start, end) of lines first to last - 1 (counting from 0, like a slice) of the file at path.
+    index is an optional lineindex_14.LineIndex of the same file.
+    """
+    if index is not None:
+        return index.line_range(first, last)
+    buf = bytearray(CHUNK)
+    start = 0 if first == 0 else None
+    line = 0  # the number of newlines before the current chunk
+    pos = 0
+    with open(path, 'rb', buffering=0) as fi:
+        while True:
+            n = fi.readinto(buf)
+            if n == 0:
+                size = pos
+                return (size if start is None else start), size
+            count = buf.count(b'\n', 0, n)
+            # Find the exact positions only in the chunk(s) where line first or line last starts
+            if start is None and line + count >= first:
+                start = pos + _nth_newline(buf, n, first - line) + 1
+            if line + count >= last:
+                return start, pos + _nth_newline(buf, n, last - line) + 1
+            line += count
+            pos += n
+
+def _nth_newline(buf, n, k):
+    # The position of the k-th (from 1) newline in buf[:n]
+    i = -1
+    for _ in range(k):
+        i = buf.find(b'\n', i + 1, n)
+    return i
+
+def _open_dst(dst, append):
+    # O_APPEND is not allowed with copy_file_range, so for appending we just start at the end of the file
+    fd = os.open(dst, os.O_WRONLY | os.O_CREAT | (0 if append else os.O_TRUNC), 0o666)
+    if append:
+        os.lseek(fd, 0, os.SEEK_END)
+    return fd
+
+def copy_lines(src, dst, first, last, append=False, index=None):
+    # Copy lines first to last - 1 of src (with their newlines) into dst. Returns the number of bytes copied.
+    start, end = line_offsets(src, first, last, index)
+    return concat(dst, [(src, start, end)], append)
+
+def concat(dst, parts, append=False):
+    """
+    Write the parts one after the other into dst. Every part is a path (the whole file) or a (path, start, end)
+    byte range. With append=True, they are added to the end of dst instead of replacing it.
+    Returns the number of bytes written.
+    """
+    total = 0
+    fd_out = _open_dst(dst, append)
+    try:
+        for part in parts:
+            path, start, end = (part, 0, None) if isinstance(part, (str, bytes, os.PathLike)) else part
+            fd_in = os.open(path, os.O_RDONLY)
+            try:
+                total += copy_range(fd_in, fd_out, start, None if end is None else max(0, end - start))
+            finally:
+                os.close(fd_in)
+    finally:
+        os.close(fd_out)
+    return total
+
+if __name__ == '__main__':
+    # python concat_14.py <output> <input> [<input> ...]    like 'cat input ... > output'
+    print(f'{concat(sys.argv[1], sys.argv[2:])} bytes written')
@@ -0,0 +1,170 @@
+"""
+Loading CSV columns into NumPy arrays, with a binary cache so the text is only parsed once (Section_15.py)
+
+Parsing text is slow: every value has to be split out of its line and converted. When the same CSV file is analysed
+again and again, we can parse it once and keep the result in NumPy's own binary format (.npy). Loading a .npy file
+with mmap_mode='r' doesn't even read it: the array is backed by the file, and only the parts we use are read from
+disk (and stay in the page cache for the next time).
+https://numpy.org/doc/stable/reference/generated/numpy.load.html
+
+- numeric columns become float64 arrays (empty values become NaN)
+- categorical columns (like Gender, with a handful of different values) are 'dictionary encoded': each distinct value
+  gets a number, and the column is stored as an int32 array of these numbers plus the list of values. 'F'/'M' for a
+  million rows is then 4 MB of codes instead of a million str objects, and comparing codes is much faster than
+  comparing strings: (table['Gender'] == table.code('Gender', 'F')).sum()
+- while parsing, the values are collected in compact typed arrays (array module, see agereport_12.py)
+
+The cache is a directory next to the file (csvdata.csv -> csvdata.csv.npycache/). It is only used if the file still
+has the same inode, size and modification time as when the cache was made, and was loaded with the same columns.
+If the cache can't be written (read-only directory, full disk), the file is simply parsed every time.
+"""
+
+import csv
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+from array import array
+
+import numpy as np
+
+import csvstream_15
+import fileutil
+
+META = 'meta.json'
+DIALECT_ATTRS = ('delimiter', 'quotechar', 'escapechar', 'doublequote', 'skipinitialspace', 'lineterminator',
+                 'quoting', 'strict')
+
+class ColumnTable:
+    # The loaded columns: table['Age'] is an array; for categorical columns, the array of codes
+    def __init__(self, columns, categories):
+        self.columns = columns  # name -> array
+        self.categories = categories  # name -> array of the distinct values; codes index into it
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def code(self, name, value):
+        # The code of one value of a categorical column (-1 if it never occurs)
+        matches = np.flatnonzero(self.categories[name] == value)
+        return int(matches[0]) if len(matches) else -1
+
+    def decoded(self, name):
+        # A categorical column as an array of its values
+        return self.categories[name][self.columns[name]]
+
+def _to_float(value):
+    return float(value) if value else math.nan
+
+def parse(path, numeric=(), categorical=(), **fmtparams):
+    # Read the CSV file once and return a ColumnTable (no cache)
+    numeric, categorical = list(numeric), list(categorical)
+    names = numeric + categorical
+    dictionaries = {name: {} for name in categorical}  # value -> code
+    types = {name: _to_float for name in numeric}
+    for name in categorical:
+        codes = dictionaries[name]
+        # setdefault gives a new value the next free number, and an old one the number it already has
+        types[name] = lambda value, codes=codes: codes.setdefault(value, len(codes))
+    values = [array('d') for _ in numeric] + [array('i') for _ in categorical]
+    appends = [column.append for column in values]
+    rows = csvstream_15.read_csv(path, columns=names, types=types, na_values=(), **fmtparams)
+    for row in rows:
+        for append, value in zip(appends, row):
+            append(value)
+    # frombuffer doesn't copy: the arrays keep using the memory of the typed arrays
+    columns = {name: np.frombuffer(column, dtype=np.float64 if column.typecode == 'd' else np.int32)
+               for name, column in zip(names, values)}
+    categories = {name: np.array(list(dictionaries[name]), dtype=str) for name in categorical}
+    return ColumnTable(columns, categories)
+
+def _dialect(fmtparams):
+    # The format the reader will actually use, as plain values that can go into JSON: dialect=csv.excel, 'excel' and
+    # no fmtparams at all give the same result
+    dialect = csv.reader([], **fmtparams).dialect
+    return {name: getattr(dialect, name) for name in DIALECT_ATTRS}
+
+def _cache_dir(path, request, cache_dir):
+    # One subdirectory per file and set of requested columns, so different requests (or different files sharing
+    # one cache_dir) don't overwrite each other
+    key = hashlib.blake2b(json.dumps(request, sort_keys=True).encode(), digest_size=8).hexdigest()
+    return os.path.join(cache_dir or path + '.npycache', key)
+
+def _source_key(path):
+    st = os.stat(path)
+    return {'ino': st.st_ino, 'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
+
+def _load_cache(directory, request, source):
+    try:
+        with open(os.path.join(directory, META)) as fo:
+            meta = json.load(fo)
+    except (OSError, ValueError):  # no cache (yet), or it can't be read
+        return None
+    if meta.get('request') != request or meta.get('source') != source:
+        return None
+    columns, categories = {}, {}
+    for i, name in enumerate(meta['names']):
+        columns[name] = np.load(os.path.join(directory, f'{i}.npy'), mmap_mode='r')
+        if name in request['categorical']:
+            categories[name] = np.load(os.path.join(directory, f'{i}.categories.npy'))
+    return ColumnTable(columns, categories)
+
+def _save(directory, request, source, table):
+    os.makedirs(directory, exist_ok=True)
+    meta_path = os.path.join(directory, META)
+    try:
+        os.remove(meta_path)  # the cache is invalid until all the arrays have been written
+    except FileNotFoundError:
+        pass
+    names = list(table.columns)
+    for i, name in enumerate(names):
+        arrays = [(f'{i}.npy', table.columns[name])]
+        if name in table.categories:
+            arrays.append((f'{i}.categories.npy', table.categories[name]))
+        for filename, arr in arrays:
+            tmp_path = os.path.join(directory, f'{filename}.tmp{os.getpid()}')
+            with open(tmp_path, 'wb') as fo:
+                np.save(fo, arr)
+            os.replace(tmp_path, os.path.join(directory, filename))
+    fileutil.write_json(meta_path, {'request': request, 'source': source, 'names': names})
+
+def load(path, numeric=(), categorical=(), cache_dir=None, **fmtparams):
+    """
+    Return a ColumnTable with the numeric and categorical columns (given by name) of the CSV file at path: from the
+    cache if it is up to date, otherwise by parsing the file and saving the cache for next time.
+    fmtparams are passed on to csv.reader, e.g. delimiter='|'.
+    """
+    abspath = os.path.abspath(path)
+    request = {'path': abspath, 'numeric': list(numeric), 'categorical': list(categorical),
+               'dialect': _dialect(fmtparams)}
+    directory = _cache_dir(abspath, request, cache_dir)
+    source = _source_key(path)
+    table = _load_cache(directory, request, source)
+    if table is None:
+        table = parse(path, numeric, categorical, **fmtparams)
+        if _source_key(path) == source:  # don't cache it if the file changed while we were reading it
+            try:
+                _save(directory, request, source, table)
+            except OSError:
+                return table  # e.g. a read-only directory or a full disk: the parsed table is just as good
+            table = _load_cache(directory, request, source) or table
+    return table
+
+if __name__ == '__main__':
+    # python csvnumpy_15.py <file.csv> <numeric column,...> [categorical column,...]
+    numeric_columns = sys.argv[2].split(',') if len(sys.argv) > 2 and sys.argv[2] else []
+    categorical_columns = sys.argv[3].split(',') if len(sys.argv) > 3 else []
+    for attempt in ('first load', 'second load'):
+        start = time.perf_counter()
+        result = load(sys.argv[1], numeric_columns, categorical_columns)
+        print(f'{attempt}: {len(result)} rows in {time.perf_counter() - start:.3f} s')
+    for column in numeric_columns:
+        print(f'{column}: mean {np.nanmean(result[column]):.3f}')
+    for column in categorical_columns:
+        counts = np.bincount(result[column], minlength=len(result.categories[column]))
+        print(f'{column}: ' + ', '.join(f'{v} {n}' for v, n in zip(result.categories[column], counts)))
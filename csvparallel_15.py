@@ -0,0 +1,175 @@
+"""
+Parsing one big CSV file on all CPU cores (Section_15.py, csvstream_15.py)
+
+csv.reader runs on one core, at a few tens of MB/s. To use more cores, the file is cut into byte ranges of a few
+tens of MB, and each range is parsed by a separate process (threads wouldn't help: the csv module holds the GIL).
+
+The ranges must start and end between two records. A range can't just end at any newline: inside a quoted field,
+a newline is part of the value ("first line\\nsecond line"). A newline ends a record only if an even number of quote
+characters comes before it - an escaped quote is written as "" and doesn't change that. So the main process reads
+through the file once, counting the quote characters block by block (bytes.count runs at memory speed, much faster
+than the parsing), and hands out each range as soon as its end has been found. With quoted_newlines=False (no field
+contains a newline), it just looks for the next newline after every cut point and doesn't read the rest at all.
+
+Each worker parses its range with csvstream_15.read_csv (so columns= and types= work the same way) and passes the
+rows to func, in the worker. func=list sends all the rows back; for aggregations, func should do the work (e.g. sum
+a column) and send back only the result. Results are returned in file order, or with ordered=False as soon as they
+are ready.
+https://docs.python.org/3/library/concurrent.futures.html#processpoolexecutor
+
+    n_rows = sum(map_ranges('big.csv', count_rows, ordered=False))
+    ages = [age for (age,) in read_rows('big.csv', columns=['Age'], types={'Age': int})]
+"""
+
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import csvstream_15
+
+CHUNK_SIZE = 32 * 1024 * 1024  # bytes per range
+SCAN_SIZE = 16 * 1024 * 1024  # bytes read at a time while looking for the record boundaries
+
+def boundaries(path, chunk_size=CHUNK_SIZE, header=True, quotechar='"', quoted_newlines=True):
+    """
+    Yield the positions where the ranges start, ending with the size of the file: range i is
+    [positions[i], positions[i + 1]). With header=True, the first position is the end of the header record.
+    """
+    size = os.path.getsize(path)
+    target = 0 if header else chunk_size  # the next cut point; the boundary is the end of the record it falls in
+    if not header:
+        yield 0
+    quote = quotechar.encode()
+    with open(path, 'rb', buffering=0) as fi:
+        if not quoted_newlines:
+            while target < size:
+                target = _after_newline(fi.fileno(), target, size)
+                if target < size:
+                    yield target
+                target += chunk_size
+            yield size
+            return
+
+        buf = bytearray(SCAN_SIZE)
+        pos = 0  # where the block in buf starts in the file
+        inside = 0  # 1 if an odd number of quotes came before the current position (we're inside a quoted field)
+        while pos < size:
+            n = fi.readinto(buf)
+            if n == 0:
+                break
+            c = 0  # current position in the block
+            while target < pos + n:
+                t = max(target - pos, c)
+                inside ^= buf.count(quote, c, t) & 1
+                c = t
+                i = buf.find(b'\n', c, n)
+                if i == -1:
+                    break
+                inside ^= buf.count(quote, c, i) & 1
+                c = i + 1
+                if not inside:
+                    if pos + c < size:
+                        yield pos + c
+                    target = pos + c + chunk_size
+            inside ^= buf.count(quote, c, n) & 1
+            pos += n
+    yield size
+
+def _after_newline(fd, pos, size):
+    # The position just after the first newline at or after pos (or the end of the file)
+    while pos < size:
+        block = os.pread(fd, 64 * 1024, pos)
+        i = block.find(b'\n')
+        if i != -1:
+            return pos + i + 1
+        pos += len(block)
+    return size
+
+def _parse_range(path, start, end, encoding, errors, columns, types, func, fmtparams):
+    with open(path, 'rb') as fi:
+        data = os.pread(fi.fileno(), end - start, start)
+    text = io.StringIO(data.decode(encoding, errors), newline='')
+    return func(csvstream_15.read_csv(text, columns=columns, types=types, header=False, **fmtparams))
+
+def _header(path, encoding, fmtparams):
+    with open(path, 'r', newline='', encoding=encoding) as fo:
+        return next(csv.reader(fo, **fmtparams), None)
+
+def map_ranges(path, func=list, columns=None, types=None, workers=None, chunk_size=CHUNK_SIZE, ordered=True,
+               header=True, quoted_newlines=True, encoding='utf-8', errors='strict', **fmtparams):
+    """
+    Parse the file in byte ranges on 'workers' processes (default: all CPUs) and yield func(rows) for every range;
+    rows are tuples, as from csvstream_15.read_csv(columns=..., types=...). func must be a function defined at the
+    top level of a module, so it can be sent to the worker processes.
+    """
+    names = _header(path, encoding, fmtparams) if header else None
+    if header and names is None:
+        return  # empty file
+    # The workers don't see the header, so column names are turned into positions here
+    positions, _ = csvstream_15.resolve_columns(columns, names)
+    types = {(names.index(key) if isinstance(key, str) and names else key): converter
+             for key, converter in (types or {}).items()}
+
+    workers = workers or os.cpu_count()
+    ranges = boundaries(path, chunk_size, header, fmtparams.get('quotechar', '"'), quoted_newlines)
+    start = next(ranges)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque() if ordered else set()
+        add = pending.append if ordered else pending.add
+        for end in ranges:
+            if end > start:
+                add(pool.submit(_parse_range, path, start, end, encoding, errors, positions, types, func, fmtparams))
+            start = end
+            # Keep a few ranges per worker queued, but don't read ahead through the whole file
+            while len(pending) >= 2 * workers:
+                yield from _collect(pending, ordered)
+        while pending:
+            yield from _collect(pending, ordered)
+
+def _collect(pending, ordered):
+    if ordered:
+        yield pending.popleft().result()
+        return
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        pending.discard(future)
+        yield future.result()
+
+def read_rows(path, columns=None, types=None, workers=None, **kwargs):
+    # All the rows of the file, in order, parsed in parallel
+    for rows in map_ranges(path, list, columns, types, workers, **kwargs):
+        yield from rows
+
+def count_rows(rows):
+    # An example of an aggregation for map_ranges: only the number of rows is sent back
+    return sum(1 for _ in rows)
+
+# ------------------------------------- BENCHMARK -------------------------------------
+def _make_csv(path, n_rows):
+    with open(path, 'w', newline='') as fo:
+        writer = csv.writer(fo)
+        writer.writerow(['Name', 'Gender', 'Age', 'Comment'])
+        for i in range(n_rows):
+            writer.writerow([f'Person {i}', 'FM'[i % 2], i % 90, 'multi\nline, "quoted"' if i % 10 == 0 else 'ok'])
+
+def benchmark(path=None, n_rows=2_000_000, workers=None):
+    with tempfile.TemporaryDirectory(prefix='csvparallel_bench_') as tmp:
+        if path is None:
+            path = os.path.join(tmp, 'bench.csv')
+            _make_csv(path, n_rows)
+        print(f'{os.path.getsize(path) / 1e6:.0f} MB')
+        start = time.perf_counter()
+        n = count_rows(csvstream_15.read_csv(path))
+        print(f'{"1 process":<16}{n:>12} rows{time.perf_counter() - start:>10.2f} s')
+        start = time.perf_counter()
+        n = sum(map_ranges(path, count_rows, workers=workers, ordered=False, chunk_size=8 * 1024 * 1024))
+        print(f'{f"{workers or os.cpu_count()} processes":<16}{n:>12} rows{time.perf_counter() - start:>10.2f} s')
+
+if __name__ == '__main__':
+    # python csvparallel_15.py [file.csv] [workers]    (without a file, a test file is created first)
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else None, workers=int(sys.argv[2]) if len(sys.argv) > 2 else None)
@@ -0,0 +1,126 @@
+"""
+Reading big CSV files row by row, with only the columns we need, already converted to numbers etc. (Section_15.py)
+
+list(csv.reader(fo)) builds a list of lists of strings for the whole file: for a file of a few GB, that's many times
+its size in memory, and every value is still a str. read_csv() is a generator instead:
+- only one row is in memory at a time, however big the file is
+- columns= picks the columns we want (by name or by position); the others are dropped straight away, with
+  operator.itemgetter, which does the picking in C
+- types= gives a converter for some of those columns (int, float, datetime.date.fromisoformat, any function of one
+  string); only these columns are converted
+- rows come out as tuples, or as named tuples (record='named'), which are as compact as tuples but allow row.Age
+
+    for name, age in read_csv('csvdata.csv', columns=['Name', 'Age'], types={'Age': int}):
+        ...
+"""
+
+import csv
+import sys
+from collections import namedtuple
+from operator import itemgetter
+
+class CSVError(ValueError):
+    pass
+
+def _open(source):
+    # A path is opened here (and closed when we're done); a file object is used as it is
+    if hasattr(source, 'read'):
+        return source, False
+    return open(source, 'r', newline=''), True  # newline='' is what the csv module expects
+
+def read_csv(source, columns=None, types=None, record='tuple', header=True, na_values=('',), **fmtparams):
+    """
+    Yield the rows of a CSV file (a path or an open file) one by one.
+    columns: names (needs a header row) or positions of the columns to keep, in the order they should come out;
+             None means all of them
+    types: {column (name or position): converter}. Values listed in na_values become None instead of being converted
+    record: 'tuple' or 'named' (named tuples; then the column names must be valid Python names)
+    header: whether the first row holds the column names (it's never returned as a row)
+    fmtparams: passed on to csv.reader, e.g. delimiter='|'
+    """
+    if record not in ('tuple', 'named'):
+        raise ValueError(f"record must be 'tuple' or 'named', not {record!r}")
+    fo, opened = _open(source)
+    try:
+        reader = csv.reader(fo, **fmtparams)
+        names = next(reader, None) if header else None
+        if header and names is None:
+            return  # empty file
+
+        positions, out_names = resolve_columns(columns, names)
+        getter = itemgetter(*positions) if positions else None
+        converters = []  # (position in the output row, converter, column name)
+        for key, converter in (types or {}).items():
+            out = _output_position(key, positions, names, out_names)
+            converters.append((out, converter, out_names[out] if out_names else out))
+        na = frozenset(na_values)
+        if record == 'named' and out_names is None:
+            raise ValueError("record='named' needs a header row or columns=")
+        make = namedtuple('Record', out_names)._make if record == 'named' else tuple
+        single = positions is not None and len(positions) == 1  # itemgetter(i) returns the value, not a tuple
+
+        for raw in reader:
+            if not raw:
+                continue  # blank line
+            name = None
+            try:
+                if getter is None:
+                    values = raw
+                elif single:
+                    values = [getter(raw)]
+                else:
+                    values = getter(raw)
+                if converters:
+                    values = list(values)
+                    for out, converter, name in converters:
+                        value = values[out]
+                        values[out] = None if value in na else converter(value)
+                row = make(values)
+            except IndexError:
+                raise CSVError(f'line {reader.line_num}: expected more columns than the {len(raw)} found') from None
+            except (ValueError, TypeError) as e:
+                where = f', column {name!r}' if name is not None else ''
+                raise CSVError(f'line {reader.line_num}{where}: {e}') from e
+            yield row
+    finally:
+        if opened:
+            fo.close()
+
+def resolve_columns(columns, names):
+    # The positions of the requested columns in the file, and the names of the output columns (also used by
+    # csvparallel_15.py)
+    if columns is None:
+        return None, names
+    positions = []
+    for column in columns:
+        if isinstance(column, int):
+            positions.append(column)
+        elif names is None:
+            raise ValueError(f'Column {column!r} given by name, but the file has no header')
+        elif column not in names:
+            raise ValueError(f'No column {column!r} in the header: {names}')
+        else:
+            positions.append(names.index(column))
+    out_names = [names[p] if names and p < len(names) else f'column{p}' for p in positions]
+    return positions, out_names
+
+def _output_position(key, positions, names, out_names):
+    # Where the column 'key' (a name or a position in the file) ends up in the output rows
+    if positions is None:
+        if isinstance(key, int):
+            return key
+        if names is None or key not in names:
+            raise ValueError(f'No column {key!r} to convert')
+        return names.index(key)
+    if isinstance(key, int):
+        if key not in positions:
+            raise ValueError(f'Column {key} is converted but not selected')
+        return positions.index(key)
+    if key not in out_names:
+        raise ValueError(f'Column {key!r} is converted but not selected')
+    return out_names.index(key)
+
+if __name__ == '__main__':
+    # python csvstream_15.py <file.csv> [column ...]    prints the chosen columns of every row
+    for row in read_csv(sys.argv[1], columns=sys.argv[2:] or None):
+        print(*row, sep='\t')
@@ -0,0 +1,170 @@
+"""
+Writing huge CSV files quickly, optionally compressed on the fly (the csv.writer part of Section_15.py)
+
+Compressing a CSV file after writing it means writing it, reading it again and writing it once more. Instead, the
+rows can be compressed while they are being written. gzip.open() does that, but in the same thread: generating the
+rows and compressing them take turns. CSVWriter overlaps them:
+- rows are collected into batches (10 000 rows by default) and each batch is turned into text with one
+  writerows() call on an in-memory buffer (io.StringIO) and encoded at once
+- the encoded blocks go through a queue to a background thread, which compresses them and writes them to the file.
+  zlib releases the GIL while it compresses, so the main thread can carry on generating rows at the same time.
+  The queue has a limited size: if compressing is slower than generating, writerow() waits instead of piling up
+  blocks in memory
+https://docs.python.org/3/library/zlib.html#zlib.compressobj
+
+compression='gzip' writes a normal .gz file (gunzip, zcat and gzip.open can read it), 'zlib' a raw zlib stream,
+None leaves the text uncompressed (the writing still happens in the background thread).
+
+    with CSVWriter('export.csv.gz', compression='gzip') as writer:
+        writer.writerow(['Name', 'Gender', 'Age'])
+        writer.writerows(rows)
+    print(f'{writer.rows_per_second:.0f} rows/s')
+"""
+
+import csv
+import gzip
+import io
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+BATCH_ROWS = 10000
+WBITS = {'gzip': 16 + zlib.MAX_WBITS, 'zlib': zlib.MAX_WBITS}  # 16 + ...: with a gzip header and trailer
+
+class CSVWriter:
+    def __init__(self, path, compression=None, level=6, batch_rows=BATCH_ROWS, queue_size=8, encoding='utf-8',
+                 **fmtparams):
+        if compression not in (None, 'gzip', 'zlib'):
+            raise ValueError(f"compression must be None, 'gzip' or 'zlib', not {compression!r}")
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, WBITS[compression]) if compression else None
+        self.fo = open(path, 'wb')
+        self.encoding = encoding
+        self.batch_rows = batch_rows
+        self.batch = []
+        self.text = io.StringIO()
+        self.writer = csv.writer(self.text, **fmtparams)
+        self.rows = 0
+        self.bytes_in = 0  # text bytes, before compression
+        self.bytes_out = 0
+        self.start = time.perf_counter()
+        self.end = None
+        self.error = None
+        self.blocks = queue.Queue(maxsize=queue_size)
+        self.thread = threading.Thread(target=self._write_blocks, name='CSVWriter', daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def writerow(self, row):
+        self.batch.append(row)
+        if len(self.batch) >= self.batch_rows:
+            self._send_batch()
+
+    def writerows(self, rows):
+        for row in rows:
+            self.batch.append(row)
+            if len(self.batch) >= self.batch_rows:
+                self._send_batch()
+
+    def _send_batch(self):
+        if not self.batch:
+            return
+        self.writer.writerows(self.batch)
+        self.rows += len(self.batch)
+        self.batch = []
+        data = self.text.getvalue().encode(self.encoding)
+        self.text.seek(0)
+        self.text.truncate()
+        self.bytes_in += len(data)
+        self._put(data)
+
+    def _put(self, data):
+        # Waits while the queue is full; gives up if the thread has stopped because of an error
+        while True:
+            if self.error is not None:
+                raise self.error
+            try:
+                self.blocks.put(data, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _write_blocks(self):
+        # The background thread: compress and write every block, until None arrives
+        try:
+            while True:
+                data = self.blocks.get()
+                if data is None:
+                    if self.compressor is not None:
+                        self._write(self.compressor.flush())
+                    return
+                self._write(self.compressor.compress(data) if self.compressor is not None else data)
+        except BaseException as e:
+            self.error = e
+
+    def _write(self, data):
+        if data:
+            self.fo.write(data)
+            self.bytes_out += len(data)
+
+    @property
+    def rows_per_second(self):
+        return self.rows / ((self.end or time.perf_counter()) - self.start)
+
+    def stats(self):
+        return {'rows': self.rows, 'seconds': (self.end or time.perf_counter()) - self.start,
+                'rows_per_second': self.rows_per_second, 'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out}
+
+    def close(self):
+        # Write what is left, wait for the background thread and close the file. Returns stats()
+        if self.end is not None:
+            return self.stats()
+        try:
+            self._send_batch()
+            self._put(None)
+            self.thread.join()
+        finally:
+            self.end = time.perf_counter()
+            self.fo.close()
+        if self.error is not None:
+            raise self.error
+        return self.stats()
+
+# ------------------------------------- BENCHMARK -------------------------------------
+def _rows(n_rows):
+    for i in range(n_rows):
+        yield [f'Person {i}', 'FM'[i % 2], i % 90, i * 0.25]
+
+def _csv_gzip_open(path, n_rows):
+    with gzip.open(path, 'wt', newline='', compresslevel=6) as fo:
+        csv.writer(fo).writerows(_rows(n_rows))
+
+def _csvwriter(path, n_rows, compression='gzip'):
+    with CSVWriter(path, compression=compression) as writer:
+        writer.writerows(_rows(n_rows))
+
+METHODS = {
+    'csv.writer + gzip.open': _csv_gzip_open,
+    'CSVWriter gzip': _csvwriter,
+    'CSVWriter uncompressed': lambda path, n_rows: _csvwriter(path, n_rows, None),
+}
+
+def benchmark(n_rows=2_000_000):
+    with tempfile.TemporaryDirectory(prefix='csvwriter_bench_') as tmp:
+        path = os.path.join(tmp, 'out.csv')
+        for name, method in METHODS.items():
+            start = time.perf_counter()
+            method(path, n_rows)
+            elapsed = time.perf_counter() - start
+            print(f'{name:<26}{elapsed:>8.2f} s{n_rows / elapsed:>12.0f} rows/s{os.path.getsize(path) / 1e6:>8.1f} MB')
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000)
@@ -0,0 +1,186 @@
+"""
+Running a graph of dependent commands in parallel, instead of one after the other as my_function in Section_18.py does
+
+Each task is a command with:
+- deps: the tasks which have to finish (successfully) before it can start
+- inputs: files (or glob patterns) it reads
+Every task whose dependencies are done is started straight away, so independent tasks run at the same time.
+If neither the command nor the content of any of its inputs has changed since its last successful run, the task is
+skipped (like 'make', but comparing content hashes instead of modification times, so e.g. a 'touch' doesn't count).
+
+At the end we also get the 'critical path': the chain of dependent tasks which took the longest. No amount of
+parallelism can make the whole graph faster than that chain, so that's where optimising pays off.
+https://en.wikipedia.org/wiki/Critical_path_method
+
+A graph can be written in Python, or in a JSON file:
+    {"tasks": [{"name": "fetch", "cmd": "..."},
+               {"name": "build", "cmd": "...", "deps": ["fetch"], "inputs": ["src/*.c"]}]}
+"""
+
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import fileutil
+import spawn_13
+
+class Task:
+    def __init__(self, name, cmd, deps=(), inputs=()):
+        self.name = name
+        self.cmd = cmd
+        self.deps = list(deps)
+        self.inputs = list(inputs)
+        self.status = 'pending'  # then: 'ok', 'skipped' (up to date), 'failed' or 'blocked' (a dependency failed)
+        self.returncode = None
+        self.start = self.end = None
+
+    @property
+    def duration(self):
+        return self.end - self.start if self.end is not None else 0.0
+
+    def fingerprint(self):
+        # A hash of the command and the content of all the input files
+        h = hashlib.blake2b(digest_size=20)
+        h.update(json.dumps(self.cmd).encode())
+        for pattern in self.inputs:
+            paths = sorted(glob.glob(pattern, recursive=True)) or [pattern]
+            for path in paths:
+                h.update(path.encode())
+                h.update(fileutil.file_hash(path).encode() if os.path.isfile(path) else b'-')
+        return h.hexdigest()
+
+class TaskGraph:
+    def __init__(self, state_file='.dag_state.json'):
+        self.tasks = {}
+        self.state_file = state_file
+
+    def add(self, name, cmd, deps=(), inputs=()):
+        if name in self.tasks:
+            raise ValueError(f'Task {name!r} is defined twice')
+        self.tasks[name] = Task(name, cmd, deps, inputs)
+        return self.tasks[name]
+
+    @classmethod
+    def load(cls, path, state_file=None):
+        with open(path) as fo:
+            spec = json.load(fo)
+        graph = cls(state_file or os.path.join(os.path.dirname(path), '.dag_state.json'))
+        for task in spec['tasks']:
+            graph.add(task['name'], task['cmd'], task.get('deps', ()), task.get('inputs', ()))
+        return graph
+
+    def check(self):
+        # Make sure every dependency exists and there are no cycles (which would never finish)
+        for task in self.tasks.values():
+            for dep in task.deps:
+                if dep not in self.tasks:
+                    raise ValueError(f'Task {task.name!r} depends on unknown task {dep!r}')
+        visiting, done = set(), set()
+
+        def visit(name, chain):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError('Dependency cycle: ' + ' -> '.join(chain + [name]))
+            visiting.add(name)
+            for dep in self.tasks[name].deps:
+                visit(dep, chain + [name])
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.tasks:
+            visit(name, [])
+
+    def _load_state(self):
+        try:
+            with open(self.state_file) as fo:
+                return json.load(fo)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _run_task(self, task, state):
+        task.start = time.perf_counter()
+        fingerprint = task.fingerprint()
+        if task.inputs and state.get(task.name) == fingerprint:
+            task.status = 'skipped'
+        else:
+            task.returncode = spawn_13.run(task.cmd)  # 127 if it can't be started, e.g. the program doesn't exist
+            task.status = 'ok' if task.returncode == 0 else 'failed'
+        task.end = time.perf_counter()
+        return fingerprint
+
+    def run(self, workers=8):
+        """
+        Run the whole graph, at most 'workers' commands at a time. Returns a dictionary with the wall time and the
+        critical path. Tasks without declared inputs are always run.
+        """
+        self.check()
+        state = self._load_state()
+        waiting_for = {name: set(task.deps) for name, task in self.tasks.items()}
+        dependents = {name: [] for name in self.tasks}
+        for task in self.tasks.values():
+            for dep in task.deps:
+                dependents[dep].append(task.name)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            running = {}
+            for name, deps in waiting_for.items():
+                if not deps:
+                    running[pool.submit(self._run_task, self.tasks[name], state)] = name
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = self.tasks[running.pop(future)]
+                    fingerprint = future.result()
+                    if task.status in ('ok', 'skipped'):
+                        state[task.name] = fingerprint
+                        for name in dependents[task.name]:
+                            waiting_for[name].discard(task.name)
+                            if not waiting_for[name] and self.tasks[name].status == 'pending':
+                                running[pool.submit(self._run_task, self.tasks[name], state)] = name
+                    else:
+                        state.pop(task.name, None)
+                        self._block(task.name, dependents)
+        wall = time.perf_counter() - start
+
+        fileutil.write_json(self.state_file, state)  # written atomically
+        length, path = self.critical_path()
+        return {'wall': wall, 'critical_path': path, 'critical_path_seconds': length,
+                'failed': [t.name for t in self.tasks.values() if t.status in ('failed', 'blocked')]}
+
+    def _block(self, name, dependents):
+        for dependent in dependents[name]:
+            if self.tasks[dependent].status == 'pending':
+                self.tasks[dependent].status = 'blocked'
+                self._block(dependent, dependents)
+
+    def critical_path(self):
+        # The longest chain of dependent tasks, measured by their run times: (total seconds, [task names])
+        best = {}
+
+        def longest(name):
+            if name not in best:
+                task = self.tasks[name]
+                chains = [longest(dep) for dep in task.deps]
+                length, path = max(chains, default=(0.0, []))
+                best[name] = (length + task.duration, path + [name])
+            return best[name]
+
+        return max((longest(name) for name in self.tasks), default=(0.0, []))
+
+if __name__ == '__main__':
+    # python dag_18.py <graph.json> [workers]
+    graph = TaskGraph.load(sys.argv[1])
+    result = graph.run(workers=int(sys.argv[2]) if len(sys.argv) > 2 else 8)
+    for task in graph.tasks.values():
+        print(f'{task.name:<24}{task.status:<10}{task.duration:>10.3f} s')
+    print(f"Wall time {result['wall']:.3f} s, critical path {result['critical_path_seconds']:.3f} s: "
+          + ' -> '.join(result['critical_path']))
+    if result['failed']:
+        print(f"Failed or blocked: {', '.join(result['failed'])}")
+        sys.exit(1)
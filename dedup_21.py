@@ -0,0 +1,233 @@
+"""
+A deduplicating backup store, as an alternative to the full copies made with shutil in Section_21.py
+
+Every copy made with shutil.copy2/copytree stores the full content again, even if only a few bytes have changed.
+Here, every file is cut into 'chunks' (about 8 KB on average) and every chunk is stored once, under the name of its
+hash ('content-addressed'). A snapshot of a tree is then just a list of files, each with the list of its chunks.
+Taking another snapshot of a mostly unchanged tree only costs the space for the chunks which are new.
+
+The cut points are 'content-defined': we cut wherever a rolling hash of the last 64 bytes has its top bits equal to
+zero. If we cut every 8 KB instead, inserting a single byte at the beginning of a file would shift all the chunks and
+none of them would match the previous snapshot any more. With content-defined cuts, only the chunk containing the
+change is new. We use the 'gear' hash from FastCDC:
+    h = (h << 1) + GEAR[byte]
+https://www.usenix.org/conference/atc16/technical-sessions/presentation/xia
+
+Looping over every byte in Python would be far too slow, so the hash is computed for a whole block at once with NumPy.
+After 64 steps, the oldest byte has been shifted out of a 64-bit h, so h at position i is:
+    sum(GEAR[data[i - k]] << k for k in range(64))
+and a sum over a window of 2w bytes is the sum over w bytes plus the previous w bytes shifted by w - six vectorized
+steps in total.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+import fileutil
+
+AVG_BITS = 13  # average chunk size 2**13 = 8 KB
+MIN_SIZE = 2 * 1024
+MAX_SIZE = 64 * 1024
+BLOCK_SIZE = 8 * 1024 * 1024
+MASK = np.uint64(((1 << AVG_BITS) - 1) << (64 - AVG_BITS))
+# A fixed table of 256 random 64-bit numbers (derived from a hash, so it is the same everywhere)
+GEAR = np.array([int.from_bytes(hashlib.blake2b(bytes([i]), digest_size=8).digest(), 'little') for i in range(256)],
+                dtype=np.uint64)
+
+def gear_hashes(data):
+    # The rolling hash after every byte of data (a bytes-like object) as a uint64 array
+    h = GEAR[np.frombuffer(data, dtype=np.uint8)]
+    width = 1
+    while width < 64:
+        shifted = np.zeros_like(h)
+        shifted[width:] = h[:-width] << np.uint64(width)
+        h += shifted  # uint64 arithmetic wraps around, just like the C version
+        width *= 2
+    return h
+
+def cut_points(data):
+    # Positions (ends of chunks) at which data should be cut, respecting MIN_SIZE and MAX_SIZE
+    candidates = np.flatnonzero((gear_hashes(data) & MASK) == 0) + 1
+    cuts = []
+    last = 0
+    for pos in candidates.tolist():
+        while pos - last > MAX_SIZE:
+            last += MAX_SIZE
+            cuts.append(last)
+        if pos - last >= MIN_SIZE:
+            cuts.append(pos)
+            last = pos
+    # Also cut the end of the data if it is too long, otherwise a file without any cut points (e.g. all zeros)
+    # would be kept in memory as a whole
+    while len(data) - last > MAX_SIZE:
+        last += MAX_SIZE
+        cuts.append(last)
+    return cuts
+
+def chunks(fo):
+    # Yield the content-defined chunks of a binary file object
+    leftover = b''
+    while True:
+        block = fo.read(BLOCK_SIZE)
+        data = leftover + block
+        if not block:
+            break
+        last = 0
+        for pos in cut_points(data):
+            yield data[last:pos]
+            last = pos
+        leftover = data[last:]
+    # The rest of the file, cut at MAX_SIZE if needed
+    for start in range(0, len(leftover), MAX_SIZE):
+        yield leftover[start:start + MAX_SIZE]
+
+class ChunkStore:
+    """
+    A backup store in a directory:
+        store/chunks/ab/cdef...    the chunks, named by their hash
+        store/snapshots/NAME.json  one file per snapshot
+    """
+    def __init__(self, path):
+        self.path = path
+        self.chunk_dir = os.path.join(path, 'chunks')
+        self.snapshot_dir = os.path.join(path, 'snapshots')
+        os.makedirs(self.chunk_dir, exist_ok=True)
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.chunk_dir, digest[:2], digest[2:])
+
+    def put(self, data):
+        # Store a chunk unless we already have it. Returns (digest, True if it was new)
+        digest = hashlib.blake2b(data, digest_size=20).hexdigest()
+        path = self._chunk_path(digest)
+        if os.path.exists(path):
+            return digest, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp{os.getpid()}'
+        with open(tmp_path, 'wb') as fo:
+            fo.write(data)
+        os.replace(tmp_path, path)  # a chunk file is either complete or not there at all
+        return digest, True
+
+    def get(self, digest):
+        with open(self._chunk_path(digest), 'rb') as fo:
+            return fo.read()
+
+    def snapshots(self):
+        # Names of all snapshots, oldest first
+        names = [name for name in os.listdir(self.snapshot_dir) if name.endswith('.json')]
+        names.sort(key=lambda name: os.path.getmtime(os.path.join(self.snapshot_dir, name)))
+        return [name[:-5] for name in names]
+
+    def _snapshot_path(self, name):
+        return os.path.join(self.snapshot_dir, name + '.json')
+
+    def load_snapshot(self, name):
+        with open(self._snapshot_path(name)) as fo:
+            return json.load(fo)
+
+    def _latest(self, source):
+        # The files of the newest snapshot taken of the tree at 'source' ({} if there is none). Snapshots of other
+        # trees can't be used: a file there with the same path, size and mtime may have a different content
+        for name in reversed(self.snapshots()):
+            snapshot = self.load_snapshot(name)
+            if snapshot['source'] == source:
+                return snapshot['files']
+        return {}
+
+    def _new_name(self):
+        # A timestamp, with a suffix if a snapshot was already taken in the same second
+        name = base = time.strftime('%Y%m%d-%H%M%S')
+        n = 1
+        while os.path.exists(self._snapshot_path(name)):
+            n += 1
+            name = f'{base}-{n}'
+        return name
+
+    def backup(self, src, name=None):
+        """
+        Take a snapshot of the tree src. Files whose size and mtime are unchanged since the previous snapshot of the
+        same tree are not read again at all. Returns a dictionary of statistics. An existing snapshot is never
+        overwritten: if 'name' is taken, FileExistsError is raised.
+        """
+        start = time.perf_counter()
+        if name is None:
+            name = self._new_name()
+        elif os.path.exists(self._snapshot_path(name)):
+            raise FileExistsError(f'Snapshot {name!r} already exists')
+        source = os.path.abspath(src)
+        old_files = self._latest(source)
+        snapshot = {'source': source, 'created': time.time(), 'dirs': [], 'files': {}}
+        stats = {'files': 0, 'bytes': 0, 'read_bytes': 0, 'new_chunks': 0, 'new_bytes': 0}
+
+        stack = ['']
+        while stack:
+            rel = stack.pop()
+            with os.scandir(os.path.join(src, rel)) as it:
+                for entry in it:
+                    relpath = os.path.join(rel, entry.name)
+                    if entry.is_dir(follow_symlinks=False):
+                        snapshot['dirs'].append(relpath)
+                        stack.append(relpath)
+                        continue
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                    old = old_files.get(relpath)
+                    if old is not None and old['size'] == st.st_size and old['mtime_ns'] == st.st_mtime_ns:
+                        chunk_list = old['chunks']
+                    else:
+                        chunk_list = []
+                        with open(entry.path, 'rb') as fo:
+                            for data in chunks(fo):
+                                digest, new = self.put(data)
+                                chunk_list.append(digest)
+                                stats['read_bytes'] += len(data)
+                                if new:
+                                    stats['new_chunks'] += 1
+                                    stats['new_bytes'] += len(data)
+                    snapshot['files'][relpath] = {'size': st.st_size, 'mode': st.st_mode, 'mtime_ns': st.st_mtime_ns,
+                                                  'chunks': chunk_list}
+                    stats['files'] += 1
+                    stats['bytes'] += st.st_size
+
+        fileutil.write_json(self._snapshot_path(name), snapshot)  # written atomically
+        stats['name'] = name
+        stats['seconds'] = time.perf_counter() - start
+        return stats
+
+    def restore(self, name, dst):
+        # Recreate the snapshot 'name' in dst, with the permissions and modification times of the originals
+        snapshot = self.load_snapshot(name)
+        os.makedirs(dst, exist_ok=True)
+        for rel in snapshot['dirs']:
+            os.makedirs(os.path.join(dst, rel), exist_ok=True)
+        for rel, info in snapshot['files'].items():
+            path = os.path.join(dst, rel)
+            with open(path, 'wb') as fo:
+                for digest in info['chunks']:
+                    fo.write(self.get(digest))
+            os.chmod(path, info['mode'] & 0o7777)
+            os.utime(path, ns=(info['mtime_ns'], info['mtime_ns']))
+
+if __name__ == '__main__':
+    # python dedup_21.py backup <store> <srcdir> [name]
+    # python dedup_21.py restore <store> <name> <dstdir>
+    # python dedup_21.py list <store>
+    command, store = sys.argv[1], ChunkStore(sys.argv[2])
+    if command == 'backup':
+        stats = store.backup(sys.argv[3], *sys.argv[4:5])
+        print(f"Snapshot {stats['name']}: {stats['files']} files, {stats['bytes']} bytes, {stats['read_bytes']} read, "
+              f"{stats['new_chunks']} new chunks ({stats['new_bytes']} bytes) in {stats['seconds']:.2f} s")
+    elif command == 'restore':
+        store.restore(sys.argv[3], sys.argv[4])
+    elif command == 'list':
+        print('\n'.join(store.snapshots()))
+    else:
+        print(f'Unknown command {command}')
@@ -0,0 +1,121 @@
+"""
+Running many commands at the same time with asyncio, instead of the Popen / wait / communicate pattern in Section_13.py
+
+Two problems with the pattern in Section_13.py:
+1. sp.wait() followed by sp.communicate() can deadlock: if the command prints more than the pipe can hold (64 KB on
+   Linux), it blocks until somebody reads the pipe - but we are not reading, we are waiting for it to finish.
+   communicate() reads stdout and stderr while waiting, so it should be called instead of wait(), not after it.
+   https://docs.python.org/3/library/subprocess.html#subprocess.Popen.wait
+2. we only run one command at a time, although most of the time is spent waiting for it.
+
+asyncio can wait for many processes at once in a single thread. A semaphore limits how many run at the same time.
+https://docs.python.org/3/library/asyncio-subprocess.html
+"""
+
+import asyncio
+import contextlib
+import os
+import shlex
+import signal
+import sys
+import time
+
+KILL_GRACE = 1.0  # seconds to wait for the rest of the output after killing a command that timed out
+
+class CommandResult:
+    def __init__(self, cmd, returncode, stdout, stderr, duration, timed_out=False):
+        self.cmd = cmd
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration
+        self.timed_out = timed_out
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.timed_out
+
+    def __repr__(self):
+        return (f'CommandResult(cmd={self.cmd!r}, returncode={self.returncode}, duration={self.duration:.3f}, '
+                f'timed_out={self.timed_out})')
+
+def kill_group(proc):
+    # Kill the command together with anything it has started (e.g. the children of a shell), which would otherwise
+    # keep the pipes open. That's why every command is started in its own session (= process group).
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    except AttributeError:  # Windows
+        proc.kill()
+
+async def run_command(cmd, timeout=None, semaphore=None, env=None, cwd=None):
+    """
+    Run a single command and capture its output. cmd is a list (no shell, like shell=False) or a string (run by the
+    shell, like shell=True). If it takes longer than timeout seconds, it is killed and timed_out is set; stdout and
+    stderr then hold what it printed before that.
+    If the command cannot be started at all (e.g. it does not exist), returncode is None and stderr says why.
+    """
+    async with semaphore or contextlib.nullcontext():
+        start = time.perf_counter()
+        try:
+            if isinstance(cmd, str):
+                proc = await asyncio.create_subprocess_shell(cmd, stdout=asyncio.subprocess.PIPE,
+                                                             stderr=asyncio.subprocess.PIPE, env=env, cwd=cwd,
+                                                             start_new_session=True)
+            else:
+                proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE,
+                                                            stderr=asyncio.subprocess.PIPE, env=env, cwd=cwd,
+                                                            start_new_session=True)
+        except OSError as e:
+            return CommandResult(cmd, None, '', str(e), time.perf_counter() - start)
+        stdout, stderr = [], []
+        # Read both pipes while waiting, so the child can never block on a full pipe. The chunks are collected as
+        # they arrive, so if the command has to be killed we still have everything it printed until then
+        readers = [asyncio.ensure_future(_read_all(proc.stdout, stdout)),
+                   asyncio.ensure_future(_read_all(proc.stderr, stderr))]
+        waiter = asyncio.ensure_future(proc.wait())
+        _, not_done = await asyncio.wait(readers + [waiter], timeout=timeout)
+        timed_out = bool(not_done)
+        if timed_out:
+            kill_group(proc)
+            # Killing the whole group closes the pipes; don't hang if something has escaped it and still holds them
+            _, still_reading = await asyncio.wait(readers, timeout=KILL_GRACE)
+            for reader in still_reading:
+                reader.cancel()
+            await asyncio.gather(*still_reading, return_exceptions=True)
+            if still_reading:
+                # proc.wait() only returns once the pipes are closed too; asyncio.subprocess.Process has no public
+                # way to close them, so close the transport underneath
+                proc._transport.close()
+            await waiter
+        return CommandResult(cmd, proc.returncode, b''.join(stdout).decode(errors='replace'),
+                             b''.join(stderr).decode(errors='replace'), time.perf_counter() - start, timed_out)
+
+async def _read_all(stream, chunks):
+    while True:
+        chunk = await stream.read(64 * 1024)
+        if not chunk:
+            return
+        chunks.append(chunk)
+
+async def run_commands_async(cmds, limit=32, timeout=None, env=None, cwd=None):
+    semaphore = asyncio.Semaphore(limit)
+    return await asyncio.gather(*(run_command(cmd, timeout, semaphore, env, cwd) for cmd in cmds))
+
+def run_commands(cmds, limit=32, timeout=None, env=None, cwd=None):
+    """
+    Run all commands in cmds, at most 'limit' at the same time, each with its own timeout (in seconds).
+    Returns a list of CommandResult in the same order as cmds.
+    """
+    return asyncio.run(run_commands_async(cmds, limit, timeout, env, cwd))
+
+if __name__ == '__main__':
+    # python executor_13.py 'cmd 1' 'cmd 2' ...  (each command is split like a shell would, but run without a shell)
+    start = time.perf_counter()
+    for result in run_commands([shlex.split(cmd) for cmd in sys.argv[1:]], timeout=60):
+        status = 'timeout' if result.timed_out else result.returncode
+        print(f'[{status}] {shlex.join(result.cmd)} ({result.duration:.3f} s)')
+        print(result.stdout, end='')
+        print(result.stderr, end='', file=sys.stderr)
+    print(f'Total: {time.perf_counter() - start:.3f} s')
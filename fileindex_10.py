@@ -0,0 +1,317 @@
+"""
+A persistent file name index for the 'system-wide search for a file' practice in Sections_10.py
+
+Even with the parallel walker from walker_10.py, every search has to list the whole tree again.
+If we run the same kind of search many times, it is much cheaper to list the tree once and save the result.
+
+The index is a single binary file containing:
+- a table of all file paths
+- for every 'trigram' (3 consecutive bytes) appearing in a file name, the sorted list of files containing it
+  (a 'posting list')
+- the listing of every directory together with its modification time, for refreshing the index later
+
+To find all files whose name contains e.g. 'report', we only need the files containing all of 'rep', 'epo', 'por',
+'ort'. We take the shortest of these posting lists and check just those names, instead of every file in the tree.
+https://swtch.com/~rsc/regexp/regexp4.html
+
+The file is opened with mmap, so opening the index does not read it: the OS only loads the pages a query touches.
+https://docs.python.org/3/library/mmap.html
+
+A directory's mtime changes whenever an entry is added, removed or renamed inside it (but not inside its
+subdirectories). So to refresh the index, we stat every known directory and list again only the ones whose mtime has
+changed.
+
+Rebuilding the posting lists takes time proportional to the whole tree. For small, frequent changes (see
+watcher_10.py), update() instead saves the new listings of the changed directories in a small 'delta' file next to the
+index (index_path + '.delta'). A search skips the indexed files of those directories and checks the names in the
+delta directly. When the delta holds more than a few percent of the files, it is merged: the index is rebuilt once.
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+
+import fileutil
+import walker_10
+
+MAGIC = b'FIDX0001'
+HEADER = struct.Struct('<8s8Q')  # magic, n_paths, n_trigrams and the offsets of the six sections
+DELTA_SUFFIX = '.delta'
+MERGE_MIN = 10000  # the delta is merged into the index when it holds more than this many entries...
+MERGE_FRACTION = 0.05  # ... and more than this fraction of the indexed files
+
+def trigrams(name):
+    # All distinct trigrams of a file name (as bytes), packed into integers
+    return {name[i] << 16 | name[i + 1] << 8 | name[i + 2] for i in range(len(name) - 2)}
+
+def _pad(fo):
+    # Align the next section to 8 bytes, so every array starts on a multiple of its item size
+    fo.write(b'\0' * (-fo.tell() % 8))
+    return fo.tell()
+
+def write_index(index_path, root, dirs):
+    """
+    Write the index file for the tree at root.
+    dirs maps every directory path to [mtime_ns, file names, subdirectory names].
+    The new file replaces the old one atomically, so readers never see a half-written index.
+    """
+    paths = []
+    postings = {}
+    for dirpath in sorted(dirs):
+        prefix = os.fsencode(dirpath) + os.sep.encode()
+        for name in dirs[dirpath][1]:
+            bname = os.fsencode(name)
+            for tri in trigrams(bname):
+                postings.setdefault(tri, array('I')).append(len(paths))
+            paths.append(prefix + bname)
+
+    tri_keys = array('I', sorted(postings))
+    post_idx = array('Q', [0])
+    for tri in tri_keys:
+        post_idx.append(post_idx[-1] + len(postings[tri]))
+    path_idx = array('Q', [0])
+    for path in paths:
+        path_idx.append(path_idx[-1] + len(path))
+
+    tmp_path = f'{index_path}.tmp{os.getpid()}'
+    with open(tmp_path, 'wb') as fo:
+        fo.write(b'\0' * HEADER.size)
+        offsets = [_pad(fo)]
+        path_idx.tofile(fo)
+        offsets.append(_pad(fo))
+        tri_keys.tofile(fo)
+        offsets.append(_pad(fo))
+        post_idx.tofile(fo)
+        offsets.append(_pad(fo))
+        for tri in tri_keys:
+            postings[tri].tofile(fo)
+        offsets.append(_pad(fo))
+        fo.writelines(paths)
+        offsets.append(_pad(fo))
+        fo.write(json.dumps({'root': root, 'dirs': dirs}).encode())
+        fo.seek(0)
+        fo.write(HEADER.pack(MAGIC, len(paths), len(tri_keys), *offsets))
+        fo.flush()
+        os.fsync(fo.fileno())
+    os.replace(tmp_path, index_path)
+
+def _mtime(dirpath):
+    try:
+        return os.stat(dirpath).st_mtime_ns
+    except OSError:
+        return None
+
+def _list(dirpath):
+    # Listing of one directory in the format stored in the index, or None if it cannot be read
+    try:
+        mtime = os.stat(dirpath).st_mtime_ns
+    except OSError:
+        return None
+    dirs, files = walker_10.list_dir(dirpath)
+    return [mtime, [entry.name for entry in files], [entry.name for entry in dirs]]
+
+def _scan(root, old_dirs, workers=16):
+    """
+    List the tree under root, one level at a time, statting all the directories of a level in parallel. Directories
+    whose mtime is the same as in old_dirs are not listed again. Returns (dirs, number of directories listed).
+    _list stats a directory before listing it: if it changes in between, the stored mtime is older than the change,
+    so the next refresh lists it again.
+    """
+    dirs = {}
+    relisted = 0
+    level = [root]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while level:
+            mtimes = pool.map(_mtime, level)
+            to_list = []
+            for dirpath, mtime in zip(level, mtimes):
+                old = old_dirs.get(dirpath)
+                if mtime is None:
+                    continue  # the directory has been removed
+                if old is not None and old[0] == mtime:
+                    dirs[dirpath] = old
+                else:
+                    to_list.append(dirpath)
+            for dirpath, listing in zip(to_list, pool.map(_list, to_list)):
+                if listing is not None:
+                    dirs[dirpath] = listing
+                    relisted += 1
+            level = [os.path.join(dirpath, sub) for dirpath in level if dirpath in dirs for sub in dirs[dirpath][2]]
+    return dirs, relisted
+
+class FileIndex:
+    def __init__(self, index_path):
+        self.index_path = index_path
+        with open(index_path, 'rb') as fo:
+            self._mm = mmap.mmap(fo.fileno(), 0, access=mmap.ACCESS_READ)
+            st = os.fstat(fo.fileno())
+        self._base_id = [st.st_ino, st.st_mtime_ns, st.st_size]  # the delta file must belong to this exact index
+        view = memoryview(self._mm)
+        magic, self.n_paths, n_tris, *offsets = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            view.release()
+            self._mm.close()
+            raise ValueError(f'{index_path} is not a file index')
+        path_idx_off, tri_keys_off, post_idx_off, postings_off, paths_off, self._dirs_off = offsets
+        # Zero-copy views into the mapped file
+        self._path_idx = view[path_idx_off:tri_keys_off][:8 * (self.n_paths + 1)].cast('Q')
+        self._tri_keys = view[tri_keys_off:post_idx_off][:4 * n_tris].cast('I')
+        self._post_idx = view[post_idx_off:postings_off][:8 * (n_tris + 1)].cast('Q')
+        self._postings = view[postings_off:paths_off][:4 * self._post_idx[-1]].cast('I')
+        self._paths = view[paths_off:]
+        self._views = [view, self._path_idx, self._tri_keys, self._post_idx, self._postings, self._paths]
+        self._base_dirs = None
+        self._load_delta()
+
+    @classmethod
+    def build(cls, start_dir, index_path, workers=16):
+        # List the whole tree once, in parallel, and save the index
+        dirs, _ = _scan(start_dir, {}, workers)
+        write_index(index_path, start_dir, dirs)
+        return cls(index_path)
+
+    def __len__(self):
+        return self.n_paths - self._delta_removed + self._delta_files
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        # The memoryviews have to be released before the mmap can be closed
+        for view in reversed(self._views):
+            view.release()
+        self._mm.close()
+
+    def path(self, i):
+        return os.fsdecode(self._paths[self._path_idx[i]:self._path_idx[i + 1]].tobytes())
+
+    def _posting(self, tri):
+        pos = bisect_left(self._tri_keys, tri)
+        if pos == len(self._tri_keys) or self._tri_keys[pos] != tri:
+            return self._postings[0:0]
+        return self._postings[self._post_idx[pos]:self._post_idx[pos + 1]]
+
+    def search(self, req_file):
+        # Yield the paths of all indexed files whose name contains req_file (the same test as in Sections_10.py)
+        query = os.fsencode(req_file)
+        if len(query) < 3:
+            candidates = range(self.n_paths)  # too short for trigrams, check every name
+        else:
+            candidates = min((self._posting(tri) for tri in trigrams(query)), key=len)
+        sep = os.sep.encode()
+        replaced = self._delta_dirs  # directories whose files are listed in the delta instead
+        for i in candidates:
+            path = self._paths[self._path_idx[i]:self._path_idx[i + 1]].tobytes()
+            k = path.rfind(sep)
+            if query in path[k + 1:] and not (replaced and path[:k] in replaced):
+                yield os.fsdecode(path)
+        for dirpath, listing in self.delta.items():
+            if listing is not None:
+                for name in listing[1]:
+                    if req_file in name:
+                        yield os.path.join(dirpath, name)
+
+    def _state(self):
+        # The root and the directory listings stored in the index itself (without the delta), parsed only once
+        if self._base_dirs is None:
+            state = json.loads(self._mm[self._dirs_off:])
+            self._root, self._base_dirs = state['root'], state['dirs']
+        return self._root, self._base_dirs
+
+    def load_dirs(self):
+        # The root and the current listing of every directory: {dirpath: [mtime_ns, files, subdirectories]}
+        root, dirs = self._state()
+        dirs = dict(dirs)  # a copy: the caller may change it
+        if self.delta:
+            for dirpath, listing in self.delta.items():
+                if listing is None:
+                    dirs.pop(dirpath, None)
+                else:
+                    dirs[dirpath] = listing
+        return root, dirs
+
+    def _load_delta(self):
+        self.delta = {}
+        self._delta_removed = 0  # the number of indexed files in the directories the delta replaces
+        try:
+            with open(self.index_path + DELTA_SUFFIX) as fo:
+                delta = json.load(fo)
+        except (FileNotFoundError, ValueError):
+            delta = None
+        if delta is not None and delta['base'] == self._base_id:
+            self.delta = delta['dirs']
+            self._delta_removed = delta['removed']
+        self._delta_changed()
+
+    def _delta_changed(self):
+        self._delta_dirs = {os.fsencode(dirpath) for dirpath in self.delta}
+        self._delta_files = sum(len(listing[1]) for listing in self.delta.values() if listing is not None)
+
+    def update(self, changes):
+        """
+        Record new listings for some directories: changes maps a directory to [mtime_ns, files, subdirectories], or
+        to None if it has been removed. Only the small delta file is written, until it is big enough to be merged.
+        """
+        root, base_dirs = self._state()
+        for dirpath, listing in changes.items():
+            if dirpath not in self.delta and dirpath in base_dirs:
+                self._delta_removed += len(base_dirs[dirpath][1])
+            self.delta[dirpath] = listing
+        self._delta_changed()
+        if len(self.delta) + self._delta_files > max(MERGE_MIN, MERGE_FRACTION * self.n_paths):
+            self.rewrite(*self.load_dirs())
+        else:
+            fileutil.write_json(self.index_path + DELTA_SUFFIX,
+                                {'base': self._base_id, 'removed': self._delta_removed, 'dirs': self.delta})
+
+    def refresh(self, workers=16):
+        """
+        Bring the index up to date by listing again only the directories whose mtime has changed.
+        Returns the number of directories that had to be listed again. The index is reopened afterwards.
+        """
+        root, old_dirs = self.load_dirs()
+        dirs, relisted = _scan(root, old_dirs, workers)
+        self.rewrite(root, dirs)
+        return relisted
+
+    def rewrite(self, root, dirs):
+        # Replace the index file with a new listing of the tree (same format as load_dirs) and reopen it
+        self.close()
+        write_index(self.index_path, root, dirs)
+        try:
+            os.remove(self.index_path + DELTA_SUFFIX)  # now part of the index (and wouldn't match the new one anyway)
+        except FileNotFoundError:
+            pass
+        self.__init__(self.index_path)
+
+if __name__ == '__main__':
+    # python fileindex_10.py build <start_dir> <index_file>
+    # python fileindex_10.py refresh <index_file>
+    # python fileindex_10.py search <index_file> <req_file>
+    command = sys.argv[1]
+    if command == 'build':
+        start = time.perf_counter()
+        with FileIndex.build(sys.argv[2], sys.argv[3]) as index:
+            print(f'Indexed {len(index)} files in {time.perf_counter() - start:.3f} s')
+    elif command == 'refresh':
+        start = time.perf_counter()
+        with FileIndex(sys.argv[2]) as index:
+            relisted = index.refresh()
+            print(f'Listed {relisted} directories again in {time.perf_counter() - start:.3f} s')
+    elif command == 'search':
+        start = time.perf_counter()
+        with FileIndex(sys.argv[2]) as index:
+            for match in index.search(sys.argv[3]):
+                print(match)
+        print(f'Search took {time.perf_counter() - start:.6f} s', file=sys.stderr)
+    else:
+        print(f'Unknown command {command}')
@@ -0,0 +1,58 @@
+"""
+Small file helpers shared by several of the practice modules (mirror_21.py, dag_18.py, csvnumpy_15.py, ...)
+"""
+
+import errno
+import hashlib
+import json
+import os
+
+# Errors meaning 'this kind of copy is not supported here, try the next one'
+UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF}
+
+def file_hash(path, chunk_size=1024 * 1024):
+    # A hash of the content of the file, read in chunks so big files don't have to fit in memory
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as fo:
+        for chunk in iter(lambda: fo.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def write_json(path, obj, indent=None):
+    """
+    Save obj as JSON without ever leaving a half-written file behind: it is written to a temporary file first, which
+    then replaces the old one (os.replace is atomic). Readers see either the old or the new content.
+    https://docs.python.org/3/library/os.html#os.replace
+    """
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    try:
+        with open(tmp_path, 'w') as fo:
+            json.dump(obj, fo, indent=indent)
+            fo.flush()
+            os.fsync(fo.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def copy_with_fallback(methods, fallback, fd_out, *args):
+    """
+    Copy with the first of methods (e.g. _copy_file_range, _sendfile, named after the os function they use) that
+    works here, calling method(*args); fallback(*args) (a plain read/write loop) if none does. A method is skipped if
+    its os function doesn't exist, and replaced by the next one if it fails with an UNSUPPORTED error - but only if
+    it hasn't written anything to fd_out yet, otherwise it's a real error (e.g. disk full).
+    Used by copytree_21.py and concat_14.py.
+    """
+    dst_pos = os.lseek(fd_out, 0, os.SEEK_CUR)
+    for method in methods:
+        if not hasattr(os, method.__name__.lstrip('_')):
+            continue
+        try:
+            return method(*args)
+        except OSError as e:
+            if e.errno not in UNSUPPORTED or os.lseek(fd_out, 0, os.SEEK_CUR) != dst_pos:
+                raise
+    return fallback(*args)
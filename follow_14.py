@@ -0,0 +1,202 @@
+"""
+Following files which keep growing ('tail -F'), instead of re-reading them with seek(0) / read() as in Section_14.py
+
+A Follower remembers how far it has read (the offset), so every read() only returns what has been appended since.
+Two things can happen to a log file in the meantime:
+- truncation: the file is emptied ('> file.log', or open(path, 'w')). The file is now smaller than our offset, so we
+  start again from the beginning. If it has been written again past our offset before we noticed, the size doesn't
+  tell us; so we also check that the last few bytes we read are still there.
+- rotation: the file is renamed (file.log -> file.log.1) and a new file.log is created. The path then points to a
+  different inode than the file we have open. We read what is left in the old file first, then switch to the new one.
+
+To wait for new data, Tail uses inotify (see watcher_10.py) instead of checking every file every second: the kernel
+wakes us up when one of the files is modified (IN_MODIFY), or when a file is created or renamed in one of their
+directories (rotation). One inotify descriptor watches all the files, however many there are.
+
+    for path, line in Tail(['app.log', 'db.log']).lines():
+        print(path, line)
+"""
+
+import os
+import sys
+
+import watcher_10
+
+CHUNK = 1024 * 1024
+CHECK_BYTES = 64  # how many of the last bytes read are compared to detect a truncated and rewritten file
+FILE_EVENTS = watcher_10.IN_MODIFY | watcher_10.IN_MOVE_SELF | watcher_10.IN_DELETE_SELF | watcher_10.IN_ATTRIB
+DIR_EVENTS = watcher_10.IN_CREATE | watcher_10.IN_MOVED_TO
+
+class Follower:
+    def __init__(self, path, from_end=False, position=None):
+        """
+        from_end=True skips what is already in the file, like 'tail -f -n 0'. position is a (inode, offset) tuple
+        saved from an earlier Follower.position: if the file is still the same one, we carry on from there.
+        """
+        self.path = path
+        self.fo = None
+        self.inode = None
+        self.offset = 0
+        self.partial = b''  # the end of the last read, if it was not a whole line
+        self.last = b''  # the last CHECK_BYTES bytes read
+        self._open(from_end, position)
+
+    def _open(self, from_end=False, position=None):
+        try:
+            self.fo = open(self.path, 'rb', buffering=0)
+        except FileNotFoundError:
+            self.fo = None  # not there yet, it may be created later
+            return
+        st = os.fstat(self.fo.fileno())
+        self.inode = st.st_ino
+        if position is not None and position[0] == st.st_ino and position[1] <= st.st_size:
+            self.offset = position[1]
+        else:
+            self.offset = st.st_size if from_end else 0
+        self.partial = b''
+        self.last = os.pread(self.fo.fileno(), min(self.offset, CHECK_BYTES), max(0, self.offset - CHECK_BYTES))
+
+    @property
+    def position(self):
+        # (inode, offset of the first byte not returned as a line yet), to continue later from where we stopped
+        return self.inode, self.offset - len(self.partial)
+
+    def close(self):
+        if self.fo is not None:
+            self.fo.close()
+            self.fo = None
+
+    def _read_to_end(self):
+        chunks = []
+        while True:
+            chunk = os.pread(self.fo.fileno(), CHUNK, self.offset)
+            if not chunk:
+                data = b''.join(chunks)
+                self.last = (self.last + data)[-CHECK_BYTES:]
+                return data
+            chunks.append(chunk)
+            self.offset += len(chunk)
+
+    def _truncated(self):
+        if os.fstat(self.fo.fileno()).st_size < self.offset:
+            return True
+        return os.pread(self.fo.fileno(), len(self.last), self.offset - len(self.last)) != self.last
+
+    def _rotated(self):
+        try:
+            return os.stat(self.path).st_ino != self.inode
+        except FileNotFoundError:
+            return True
+
+    def read(self):
+        """
+        Return the bytes appended since the last call (b'' if there are none), following truncation and rotation.
+        """
+        if self.fo is None:
+            self._open()
+            if self.fo is None:
+                return b''
+        if self._truncated():
+            self.offset = 0
+            self.partial = self.last = b''
+        data = self._read_to_end()
+        if self._rotated():
+            # The rest of the old file has just been read; now start on the new one (if it exists yet). An unfinished
+            # last line of the old file ends here, so it doesn't run into the first line of the new one
+            data = self.partial + data
+            if data and not data.endswith(b'\n'):
+                data += b'\n'
+            self.partial = b''
+            self.close()
+            self._open()
+            if self.fo is not None:
+                data += self._read_to_end()
+        return data
+
+    def read_lines(self, encoding='utf-8', errors='replace'):
+        # Return the complete new lines (without newlines); an unfinished last line is kept until it is finished.
+        # read() comes first: if the file was truncated, it drops the unfinished line, which will never be finished
+        new = self.read()
+        data = self.partial + new
+        if not data:
+            return []
+        lines = data.split(b'\n')
+        self.partial = lines.pop()
+        return [line.decode(encoding, errors).rstrip('\r') for line in lines]
+
+class Tail:
+    """
+    Follow several files at once, waiting for new data with inotify. Files which do not exist yet are picked up when
+    they are created.
+    """
+    def __init__(self, paths, from_end=False, positions=None):
+        positions = positions or {}
+        self.followers = {path: Follower(path, from_end, positions.get(path)) for path in paths}
+        self.inotify = watcher_10.Inotify()
+        self.file_wds = {}  # watch descriptor -> path of a followed file
+        self.dir_wds = {}  # watch descriptor -> names of the followed files in that directory
+        for path in self.followers:
+            dirpath, name = os.path.split(os.path.abspath(path))
+            wd = self.inotify.add_watch(dirpath, DIR_EVENTS | watcher_10.IN_ONLYDIR)
+            self.dir_wds.setdefault(wd, {})[name] = path
+            self._watch_file(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        for follower in self.followers.values():
+            follower.close()
+        self.inotify.close()
+
+    @property
+    def positions(self):
+        return {path: follower.position for path, follower in self.followers.items()}
+
+    def _watch_file(self, path):
+        # Watching a path watches the inode it points to now. After a rotation the new file needs a new watch (the
+        # old one is removed by the kernel when the old file is deleted, or stays harmless until then)
+        try:
+            self.file_wds[self.inotify.add_watch(path, FILE_EVENTS)] = path
+        except FileNotFoundError:
+            pass
+
+    def _changed(self, events):
+        # The paths which may have new data, from a list of inotify events
+        changed = set()
+        for wd, mask, cookie, name in events:
+            if mask & watcher_10.IN_Q_OVERFLOW:
+                return set(self.followers)  # events were lost: check everything
+            if wd in self.file_wds:
+                changed.add(self.file_wds[wd])
+                if mask & watcher_10.IN_IGNORED:
+                    del self.file_wds[wd]
+            elif wd in self.dir_wds and name in self.dir_wds[wd]:
+                path = self.dir_wds[wd][name]
+                changed.add(path)
+                self._watch_file(path)  # a new file appeared under this name
+        return changed
+
+    def lines(self, timeout=None, encoding='utf-8'):
+        """
+        Yield (path, line) for every new line in any of the files. Waits forever for new lines, or returns after
+        timeout seconds without any.
+        """
+        pending = set(self.followers)  # first, whatever is there already
+        while True:
+            for path in sorted(pending):
+                for line in self.followers[path].read_lines(encoding):
+                    yield path, line
+            events = self.inotify.read_events(timeout)
+            if not events:
+                return
+            pending = self._changed(events)
+
+if __name__ == '__main__':
+    # python follow_14.py <file> [<file> ...]    like 'tail -F -n 0'
+    with Tail(sys.argv[1:], from_end=True) as tail:
+        for path, line in tail.lines():
+            print(f'{path}: {line}' if len(sys.argv) > 2 else line, flush=True)
@@ -0,0 +1,148 @@
+"""
+Random access to the lines of a huge text file, building on seek() / readline() / readlines() from Section_14.py
+
+fo.seek(10) jumps to a byte position, not to a line: to get line number 5 000 000, readline() or readlines() have
+to read everything before it. For a log of several GB, that's a lot of reading for one line.
+
+A line index remembers where every line starts (the position after every '\\n'), as 8-byte integers in a compact
+array('Q'). With the index, 'give me lines i to j' is just: look up where line i starts and where line j starts,
+and read exactly those bytes. The file is accessed through mmap, so nothing else is read.
+https://docs.python.org/3/library/array.html
+https://docs.python.org/3/library/mmap.html
+
+The index is saved next to the file (file.txt -> file.txt.lidx). If the file has only been appended to since then
+(like with the 'a+' mode in Section_14.py), update() only scans the new part. To check that the old part really is
+unchanged, the index also stores the file's inode and a hash of the last few KB it has seen.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+MAGIC = b'LIDX0001'
+HEADER = struct.Struct('<8sQQ20s')  # magic, inode, number of bytes indexed, hash of the bytes just before that
+TAIL = 4096
+
+class LineIndex:
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = index_path or path + '.lidx'
+        self.fo = open(path, 'rb')
+        self.mm = None
+        self.starts = array('Q', [0])  # starts[i] = position of line i; one entry after every newline
+        self.size = 0  # number of bytes indexed
+        self._saved_tail = None  # hash of the TAIL bytes before self.size, to notice when they change
+        self._load()
+        self.update()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        self.fo.close()
+
+    def _tail_hash(self, end):
+        return hashlib.blake2b(self.mm[max(0, end - TAIL):end], digest_size=20).digest()
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'rb') as fi:
+                magic, inode, size, tail_hash = HEADER.unpack(fi.read(HEADER.size))
+                if magic != MAGIC or inode != os.fstat(self.fo.fileno()).st_ino:
+                    return
+                starts = array('Q')
+                starts.frombytes(fi.read())
+        except (FileNotFoundError, struct.error):
+            return
+        self.starts, self.size, self._saved_tail = starts, size, tail_hash
+
+    def save(self):
+        tmp_path = f'{self.index_path}.tmp{os.getpid()}'
+        with open(tmp_path, 'wb') as fi:
+            tail = self._tail_hash(self.size) if self.mm is not None else b'\0' * 20
+            fi.write(HEADER.pack(MAGIC, os.fstat(self.fo.fileno()).st_ino, self.size, tail))
+            self.starts.tofile(fi)
+        os.replace(tmp_path, self.index_path)
+
+    def update(self, save=True):
+        """
+        Index whatever has been appended to the file since the last update. If the file has been truncated or
+        rewritten instead, the index is rebuilt from scratch, and if another file has been moved to the path (e.g. a
+        rotated log), that file is opened and indexed instead. Returns the number of new line starts found.
+        """
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        rebuild = False
+        try:
+            if os.stat(self.path).st_ino != os.fstat(self.fo.fileno()).st_ino:
+                self.fo.close()
+                self.fo = open(self.path, 'rb')
+                rebuild = True
+        except FileNotFoundError:
+            pass  # deleted: keep reading the file we have open
+        file_size = os.fstat(self.fo.fileno()).st_size
+        if file_size:
+            self.mm = mmap.mmap(self.fo.fileno(), 0, access=mmap.ACCESS_READ)
+        if rebuild or file_size < self.size or (self.size and self._tail_hash(self.size) != self._saved_tail):
+            self.starts, self.size = array('Q', [0]), 0  # not just appended to: start again
+        if file_size == self.size:
+            self._saved_tail = self._tail_hash(self.size) if self.size else None
+            return 0
+
+        before = len(self.starts)
+        find, append = self.mm.find, self.starts.append
+        pos = find(b'\n', self.size)
+        while pos != -1:
+            append(pos + 1)
+            pos = find(b'\n', pos + 1)
+        self.size = file_size
+        self._saved_tail = self._tail_hash(self.size)
+        if save:
+            self.save()
+        return len(self.starts) - before
+
+    def __len__(self):
+        # The number of lines, counting a last line without a newline at the end
+        return len(self.starts) - (1 if self.starts[-1] == self.size else 0)
+
+    def line_range(self, i, j):
+        # The byte range (start, end) holding lines i to j - 1
+        n = len(self)
+        i, j = max(0, min(i, n)), max(0, min(j, n))
+        if i >= j:
+            return 0, 0
+        end = self.starts[j] if j < len(self.starts) else self.size
+        return self.starts[i], end
+
+    def lines(self, i, j, encoding='utf-8', errors='replace'):
+        # Lines i to j - 1 (counting from 0, like a slice), without the newlines
+        start, end = self.line_range(i, j)
+        if start == end:
+            return []
+        text = self.mm[start:end].decode(encoding, errors)
+        lines = (text[:-1] if text.endswith('\n') else text).split('\n')
+        return [line.rstrip('\r') for line in lines] if '\r' in text else lines
+
+    def line(self, i, encoding='utf-8'):
+        result = self.lines(i, i + 1, encoding)
+        if not result and not 0 <= i < len(self):
+            raise IndexError(f'line {i} out of range')
+        return result[0] if result else ''
+
+if __name__ == '__main__':
+    # python lineindex_14.py <file> <first line> [last line]  (counting from 1, like 'sed -n first,lastp')
+    first = int(sys.argv[2])
+    last = int(sys.argv[3]) if len(sys.argv) > 3 else first
+    with LineIndex(sys.argv[1]) as index:
+        for line in index.lines(first - 1, last):
+            print(line)
@@ -0,0 +1,169 @@
+"""
+An incremental mirror, instead of shutil.copytree followed by shutil.rmtree as in Section_21.py
+
+Copying the whole tree for every backup is a waste when only a few files have changed.
+Like rsync, we keep a 'manifest' of what the backup contains (size, modification time and optionally a hash of every
+file) and on the next run:
+- files whose size and mtime have not changed are skipped, without even opening them
+- with use_hash=True, files whose mtime has changed but whose content has not (e.g. after 'touch') only get their
+  timestamps updated instead of being copied again
+- files which no longer exist in the source are deleted from the backup
+The manifest is written to a temporary file which then replaces the old one (os.replace is atomic), so an
+interrupted run never leaves a broken manifest behind. Anything not in the manifest is simply copied again next time.
+Only regular files and directories are mirrored; symbolic links are skipped.
+https://docs.python.org/3/library/os.html#os.replace
+"""
+
+import json
+import os
+import shutil
+import stat
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import copytree_21
+import fileutil
+
+MANIFEST_NAME = '.mirror_manifest.json'
+
+file_hash = fileutil.file_hash
+
+def scan(src):
+    # Return ({relative path: (size, mtime_ns)} for all files, [relative paths of all directories]) with one stat per file
+    files, dirs = {}, []
+    stack = ['']
+    while stack:
+        rel = stack.pop()
+        with os.scandir(os.path.join(src, rel)) as it:
+            for entry in it:
+                relpath = os.path.join(rel, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(relpath)
+                    stack.append(relpath)
+                elif entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    files[relpath] = (st.st_size, st.st_mtime_ns)
+    return files, dirs
+
+def load_manifest(path):
+    try:
+        with open(path) as fo:
+            return json.load(fo)
+    except FileNotFoundError:
+        return {'files': {}, 'dirs': []}
+
+def write_manifest(path, manifest):
+    fileutil.write_json(path, manifest)  # written atomically
+
+def _make_room(path, want_dir):
+    # Remove what is at path in the mirror if it has the wrong type: a file where a directory should be, or the
+    # other way round (a path in the source can change from one to the other between two runs)
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return
+    if stat.S_ISDIR(st.st_mode) and not want_dir:
+        shutil.rmtree(path)
+    elif not stat.S_ISDIR(st.st_mode) and want_dir:
+        os.remove(path)
+
+def mirror(src, dst, manifest_path=None, use_hash=False, delete=True, workers=16):
+    """
+    Make dst an exact copy of the tree src, copying only what has changed since the last run.
+    Returns a dictionary with the number of files copied, touched (timestamps only), unchanged and deleted.
+    """
+    start = time.perf_counter()
+    manifest_path = manifest_path or os.path.join(dst, MANIFEST_NAME)
+    os.makedirs(dst, exist_ok=True)
+    old = load_manifest(manifest_path)
+    old_files = old['files']
+    files, dirs = scan(src)
+    files.pop(MANIFEST_NAME, None)
+
+    new_files = {}
+    to_copy, to_check = [], []
+    for rel, (size, mtime) in files.items():
+        entry = old_files.get(rel)
+        if entry is not None and entry[0] == size and entry[1] == mtime:
+            new_files[rel] = entry
+        elif use_hash and entry is not None and entry[0] == size and entry[2] is not None:
+            to_check.append(rel)
+        else:
+            to_copy.append(rel)
+
+    deleted = 0
+    if delete:
+        # Before creating the directories: a file which has become a directory has to go first
+        for rel in old_files.keys() - files.keys():
+            try:
+                os.remove(os.path.join(dst, rel))
+                deleted += 1
+            except (FileNotFoundError, IsADirectoryError):
+                pass
+
+    errors = []
+    for rel in dirs:
+        try:
+            _make_room(os.path.join(dst, rel), want_dir=True)
+            os.makedirs(os.path.join(dst, rel), exist_ok=True)
+        except OSError as e:
+            errors.append(str(e))
+
+    copied = touched = 0
+
+    def check_one(rel):
+        # Same size but a new mtime: compare the content hash before copying
+        digest = file_hash(os.path.join(src, rel))
+        if digest == old_files[rel][2]:
+            shutil.copystat(os.path.join(src, rel), os.path.join(dst, rel))
+            return rel, digest, False
+        return rel, digest, True
+
+    def copy_one(rel):
+        srcpath, dstpath = os.path.join(src, rel), os.path.join(dst, rel)
+        digest = file_hash(srcpath) if use_hash else None
+        _make_room(dstpath, want_dir=False)  # a directory which has become a file
+        copytree_21.copy_file(srcpath, dstpath)
+        return rel, digest
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for future in [pool.submit(check_one, rel) for rel in to_check]:
+            try:
+                rel, digest, changed = future.result()
+            except OSError as e:
+                errors.append(str(e))
+                continue
+            if changed:
+                to_copy.append(rel)
+            else:
+                new_files[rel] = [*files[rel], digest]
+                touched += 1
+        for future in [pool.submit(copy_one, rel) for rel in to_copy]:
+            try:
+                rel, digest = future.result()
+            except OSError as e:
+                errors.append(str(e))
+                continue
+            new_files[rel] = [*files[rel], digest]
+            copied += 1
+
+    if delete:
+        # Deepest directories first, so their parents are empty by the time we get to them
+        for rel in sorted(set(old['dirs']) - set(dirs), key=len, reverse=True):
+            try:
+                os.rmdir(os.path.join(dst, rel))
+            except OSError:
+                pass  # not empty: it contains files which were never part of the mirror
+
+    write_manifest(manifest_path, {'files': new_files, 'dirs': dirs})
+    if errors:
+        raise shutil.Error(errors)
+    return {'copied': copied, 'touched': touched, 'unchanged': len(files) - len(to_copy) - touched,
+            'deleted': deleted, 'seconds': time.perf_counter() - start}
+
+if __name__ == '__main__':
+    # python mirror_21.py <srcdir> <dstdir> [--hash]
+    stats = mirror(sys.argv[1], sys.argv[2], use_hash='--hash' in sys.argv[3:])
+    print(f"{stats['copied']} copied, {stats['touched']} touched, {stats['unchanged']} unchanged, "
+          f"{stats['deleted']} deleted in {stats['seconds']:.2f} s")
@@ -0,0 +1,132 @@
+"""
+Chaining commands like 'cmd1 | cmd2 | cmd3' without the data going through Python (see Section_13.py)
+
+If we capture the output of one Popen with communicate() and pass it to the next one, every byte is copied into
+Python and out again, and the whole output is kept in memory in between.
+Instead, we can connect the stdout of one process directly to the stdin of the next with an OS pipe, as the shell
+does. The processes then run at the same time and the data goes straight from one to the next through the kernel;
+Python only reads what comes out of the last one (if it wants it at all).
+https://docs.python.org/3/library/subprocess.html#replacing-shell-pipeline
+
+    pipeline = Command('cat', 'huge.log') | Command('grep', 'ERROR') | Command('sort') | Command('uniq', '-c')
+    output = pipeline.run()                # all of the output at once, or
+    for line in pipeline.iter_lines():     # line by line, while it is still running
+        print(line)
+
+Unlike with shell=True, no shell is started and the arguments need no quoting.
+"""
+
+import signal
+import subprocess
+import sys
+
+import spawn_13
+
+class PipelineError(subprocess.CalledProcessError):
+    pass
+
+class Command:
+    def __init__(self, *args):
+        # Command('grep', '-i', 'error'), Command(['grep', '-i', 'error']) or Command('grep -i error')
+        if len(args) == 1:
+            args = args[0]
+        self.argv = spawn_13.to_argv(args)
+
+    def __or__(self, other):
+        return Pipeline([self]) | other
+
+    def __repr__(self):
+        return f'Command({self.argv!r})'
+
+class Pipeline:
+    def __init__(self, commands):
+        self.commands = list(commands)
+        self.returncodes = []
+
+    def __or__(self, other):
+        if isinstance(other, Pipeline):
+            return Pipeline(self.commands + other.commands)
+        if not isinstance(other, Command):
+            other = Command(other)
+        return Pipeline(self.commands + [other])
+
+    def __repr__(self):
+        return ' | '.join(' '.join(command.argv) for command in self.commands)
+
+    def start(self, stdin=None, stdout=subprocess.PIPE, stderr=None):
+        """
+        Start all the commands, each reading from the previous one. stdin is what the first one reads (default: our
+        stdin), stdout where the last one writes (default: a pipe we can read from). Returns the list of Popen objects.
+        """
+        procs = []
+        try:
+            for i, command in enumerate(self.commands):
+                last = i == len(self.commands) - 1
+                proc = subprocess.Popen(command.argv, stdin=procs[-1].stdout if procs else stdin,
+                                        stdout=stdout if last else subprocess.PIPE, stderr=stderr)
+                if procs:
+                    # Only the next process should hold the read end of the pipe. Otherwise the previous one would
+                    # not get SIGPIPE when the next one exits early, and could block forever
+                    procs[-1].stdout.close()
+                procs.append(proc)
+        except OSError:
+            self._kill(procs)
+            raise
+        return procs
+
+    def _kill(self, procs):
+        for proc in procs:
+            if proc.poll() is None:
+                proc.kill()
+        self._wait(procs)
+
+    def _wait(self, procs):
+        for proc in procs:
+            if proc.stdout is not None:
+                proc.stdout.close()
+        self.returncodes = [proc.wait() for proc in procs]
+        return self.returncodes
+
+    def _check(self, check):
+        # Like 'set -o pipefail', but a command killed by SIGPIPE because a later one stopped reading is not an error
+        if not check:
+            return
+        for i, rc in enumerate(self.returncodes):
+            if rc != 0 and not (rc == -signal.SIGPIPE and i < len(self.returncodes) - 1):
+                raise PipelineError(rc, self.commands[i].argv)
+
+    def run(self, stdin=None, stdout=subprocess.PIPE, check=False):
+        """
+        Run the pipeline to the end. With the default stdout, returns the output of the last command as bytes;
+        stdout can also be an open file (or file descriptor), and then None is returned.
+        After the run, self.returncodes holds the exit code of every command.
+        """
+        procs = self.start(stdin, stdout)
+        output = procs[-1].stdout.read() if stdout == subprocess.PIPE else None
+        self._wait(procs)
+        self._check(check)
+        return output
+
+    def iter_lines(self, stdin=None, encoding='utf-8', errors='replace', check=False):
+        # Yield the lines printed by the last command as they arrive. Stopping early kills the whole pipeline.
+        procs = self.start(stdin)
+        finished = False
+        try:
+            for raw in iter(lambda: procs[-1].stdout.readline(1024 * 1024), b''):
+                yield raw.decode(encoding, errors).rstrip('\r\n')
+            finished = True
+        finally:
+            if finished:
+                self._wait(procs)
+            else:
+                self._kill(procs)
+        self._check(check)
+
+def pipeline(*commands):
+    # pipeline(['ls', '-l'], 'grep py', ['wc', '-l']) is the same as Command(...) | Command(...) | Command(...)
+    return Pipeline(command if isinstance(command, Command) else Command(command) for command in commands)
+
+if __name__ == '__main__':
+    # python pipeline_13.py 'cmd 1' 'cmd 2' ...   runs cmd 1 | cmd 2 | ... and prints the output
+    for line in pipeline(*sys.argv[1:]).iter_lines():
+        print(line)
@@ -0,0 +1,157 @@
+"""
+A parallel replacement for shutil.rmtree (Section_21.py) and os.system(f"rm -r {path}") (Sections_10.py)
+
+Deleting a tree is one unlink() per file, and shutil.rmtree does them one after the other. Like in walker_10.py,
+the time goes into waiting for the file system, so several threads can unlink files at the same time.
+(os.system("rm -r ...") is no faster: it also deletes serially, and on top of that starts a shell - which breaks on
+paths with spaces, or worse, if the path comes from the user.)
+
+Every directory is opened relative to the file descriptor of its parent (os.open(name, dir_fd=parent_fd)) with
+O_NOFOLLOW, its files are unlinked relative to its own descriptor, and once it is empty it is removed relative to its
+parent's descriptor (os.rmdir(name, dir_fd=parent_fd)). No path string is ever resolved again after the top directory
+has been opened, so if someone replaces a directory - at any level - with a symbolic link while we're deleting, we do
+not follow it and delete files somewhere else. This is the same protection shutil.rmtree uses on Linux.
+Symbolic links themselves are removed, never followed.
+https://docs.python.org/3/library/os.html#dir-fd
+
+The directories are processed in parallel, and the files of a big directory are unlinked in batches of UNLINK_BATCH
+by all the threads (a flat directory with millions of files is the usual case). A directory is removed as soon as its
+last file and subdirectory are gone.
+Subdirectories waiting to be processed are taken newest first (depth first), so only a few directories along the
+current branches are open at a time, not one descriptor per directory of a wide tree.
+"""
+
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+UNLINK_BATCH = 1000  # files unlinked per task: a huge directory is spread over all the threads
+_DIR_FLAGS = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0) | getattr(os, 'O_NOFOLLOW', 0)
+
+class _Dir:
+    # A directory being deleted; its descriptor stays open until all of its files and subdirectories have been removed
+    __slots__ = ('parent', 'name', 'path', 'fd', 'remaining')
+
+    def __init__(self, parent, name, path):
+        self.parent = parent
+        self.name = name
+        self.path = path
+        self.fd = -1
+        self.remaining = 0  # subdirectories not removed yet + batches of files not unlinked yet
+
+def _clear_dir(node):
+    # Open the directory, list it and unlink the first UNLINK_BATCH files. Returns (files removed, subdirectory names,
+    # names of the files left to unlink, errors)
+    try:
+        if node.parent is None:
+            node.fd = os.open(node.path, _DIR_FLAGS)
+        else:
+            node.fd = os.open(node.name, _DIR_FLAGS, dir_fd=node.parent.fd)
+    except OSError as e:
+        return 0, [], [], [(node.path, str(e))]
+    subdirs, names = [], []
+    try:
+        with os.scandir(node.fd) as it:
+            for entry in it:
+                (subdirs if entry.is_dir(follow_symlinks=False) else names).append(entry.name)
+    except OSError as e:
+        return 0, subdirs, [], [(node.path, str(e))]
+    removed, errors = _unlink(node, names[:UNLINK_BATCH])
+    return removed, subdirs, names[UNLINK_BATCH:], errors
+
+def _unlink(node, names):
+    # Unlink some of the files of an open directory. Returns (files removed, errors)
+    removed, errors = 0, []
+    for name in names:
+        try:
+            os.unlink(name, dir_fd=node.fd)
+            removed += 1
+        except FileNotFoundError:
+            pass  # somebody else was faster
+        except OSError as e:
+            errors.append((os.path.join(node.path, name), str(e)))
+    return removed, errors
+
+def _remove_dir(node):
+    # The directory is empty now (or as empty as we could make it): close it and remove it from its parent
+    if node.fd >= 0:
+        os.close(node.fd)
+        node.fd = -1
+    try:
+        if node.parent is None:
+            os.rmdir(node.path)
+        else:
+            os.rmdir(node.name, dir_fd=node.parent.fd)
+        return None
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        return node.path, str(e)
+
+def parallel_rmtree(path, workers=16, ignore_errors=False):
+    """
+    Delete the directory tree at path, like shutil.rmtree(path), with many files unlinked at the same time.
+    Returns a dictionary with the number of files and directories removed and the time it took.
+    Unless ignore_errors is True, raises shutil.Error with a list of (path, reason) if anything could not be removed.
+    """
+    start = time.perf_counter()
+    if os.path.islink(path):
+        raise OSError(f'Cannot call parallel_rmtree on a symbolic link: {path}')
+    files = dirs = 0
+    errors = []
+    waiting = [_Dir(None, None, path)]  # directories not started yet, the most recently found last
+    pending = {}  # future -> ('clear', 'unlink' or 'remove', directory)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        def one_less(node):
+            # A subdirectory or a batch of files of node is gone; once nothing is left, node can go too
+            node.remaining -= 1
+            if node.remaining == 0:
+                pending[pool.submit(_remove_dir, node)] = ('remove', node)
+
+        while waiting or pending:
+            while waiting and len(pending) < 2 * workers:
+                node = waiting.pop()
+                pending[pool.submit(_clear_dir, node)] = ('clear', node)
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                step, node = pending.pop(future)
+                if step == 'clear':
+                    removed, subdirs, names, errs = future.result()
+                    files += removed
+                    errors.extend(errs)
+                    if node.fd < 0:
+                        subdirs = []  # it could not be opened: nothing below it can be removed
+                    # The rest of a big directory's files are unlinked in batches by all the threads, through the
+                    # same descriptor
+                    batches = [names[i:i + UNLINK_BATCH] for i in range(0, len(names), UNLINK_BATCH)]
+                    node.remaining = len(subdirs) + len(batches)
+                    for batch in batches:
+                        pending[pool.submit(_unlink, node, batch)] = ('unlink', node)
+                    waiting.extend(_Dir(node, name, os.path.join(node.path, name)) for name in subdirs)
+                    if not node.remaining:
+                        pending[pool.submit(_remove_dir, node)] = ('remove', node)
+                elif step == 'unlink':
+                    removed, errs = future.result()
+                    files += removed
+                    errors.extend(errs)
+                    one_less(node)
+                else:
+                    result = future.result()
+                    if result is None:
+                        dirs += 1
+                    else:
+                        errors.append(result)
+                    if node.parent is not None:
+                        one_less(node.parent)
+
+    if errors and not ignore_errors:
+        raise shutil.Error(errors)
+    return {'files': files, 'dirs': dirs, 'seconds': time.perf_counter() - start}
+
+if __name__ == '__main__':
+    # python rmtree_21.py <directory> [workers]
+    stats = parallel_rmtree(sys.argv[1], workers=int(sys.argv[2]) if len(sys.argv) > 2 else 16)
+    print(f"Removed {stats['files']} files and {stats['dirs']} directories in {stats['seconds']:.2f} s")
@@ -0,0 +1,136 @@
+"""
+Starting processes quickly with os.posix_spawn, instead of os.system / Popen(shell=True) (Section_13.py, Section_18.py)
+
+os.system(cmd) and Popen(cmd, shell=True) both start /bin/sh, which then starts the actual command: two processes
+for every command. And the classic way of starting a process is fork() + exec(): fork() makes a copy of the whole
+parent process first. The memory is copied lazily ('copy on write'), but the kernel still has to copy the page tables,
+which takes longer the more memory the parent uses - for a Python process holding a few GB, that's milliseconds per
+command.
+
+posix_spawn() starts a new program directly. On Linux (glibc), it uses vfork semantics: the child borrows the
+parent's memory instead of copying it, until it calls exec. So its cost does not depend on the size of the parent.
+https://docs.python.org/3/library/os.html#os.posix_spawn
+https://man7.org/linux/man-pages/man3/posix_spawn.3.html
+(Recent versions of Popen use posix_spawn or vfork themselves where they can, e.g. with close_fds=False, and recent
+C libraries implement system() with posix_spawn too. The benchmark below shows what your Python and C library
+actually do.)
+
+We only need a shell for shell syntax: $VARIABLES, pipes, redirections, wildcards, ';', '&&', etc.
+For everything else, the command is split into a list the way the shell would, and started directly.
+"""
+
+import os
+import shlex
+import subprocess
+import sys
+import time
+
+SHELL_CHARS = set('$`|&;<>()*?[]{}~!#\n')
+SHELL_BUILTINS = {'cd', 'exit', 'export', 'source', '.', 'set', 'unset', 'alias', 'exec', 'eval', 'ulimit', 'umask'}
+
+def needs_shell(cmd):
+    # True if the command string uses any shell syntax. Inside single quotes nothing is special; inside double quotes
+    # only $, ` and \ are
+    if isinstance(cmd, (list, tuple)):
+        return False
+    quote = None
+    for char in cmd:
+        if quote == "'":
+            if char == "'":
+                quote = None
+        elif quote == '"':
+            if char == '"':
+                quote = None
+            elif char in '$`\\':
+                return True
+        elif char in '\'"':
+            quote = char
+        elif char in SHELL_CHARS:
+            return True
+    try:
+        argv = shlex.split(cmd)
+    except ValueError:
+        return True  # e.g. unbalanced quotes: let the shell report the error
+    # 'VAR=value cmd' and builtins like 'cd' only exist inside a shell
+    return not argv or '=' in argv[0] or argv[0] in SHELL_BUILTINS
+
+def to_argv(cmd):
+    if isinstance(cmd, (list, tuple)):
+        return list(cmd)
+    if needs_shell(cmd):
+        return ['/bin/sh', '-c', cmd]
+    return shlex.split(cmd)
+
+def spawn(cmd, env=None, stdin=None, stdout=None, stderr=None):
+    """
+    Start cmd (a list, or a string which is run through /bin/sh only if it needs to be) and return its pid.
+    stdin/stdout/stderr can be file descriptors to connect to the child's 0/1/2.
+    """
+    argv = to_argv(cmd)
+    actions = []
+    for target, fd in ((0, stdin), (1, stdout), (2, stderr)):
+        if fd is not None and fd != target:
+            actions.append((os.POSIX_SPAWN_DUP2, fd, target))
+    # posix_spawnp searches $PATH, like the shell
+    return os.posix_spawnp(argv[0], argv, os.environ if env is None else env, file_actions=actions)
+
+def wait(pid):
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status)
+
+def run(cmd, env=None):
+    # Like os.system(cmd): run the command with our stdin/stdout/stderr and return its exit code. A command that
+    # cannot be started (not found, not executable) returns 127, as from the shell, instead of raising
+    try:
+        pid = spawn(cmd, env)
+    except OSError as e:
+        print(f'{to_argv(cmd)[0]}: {e.strerror}', file=sys.stderr)
+        return 127
+    return wait(pid)
+
+def run_capture(cmd, env=None):
+    # Run the command and return (exit code, standard output as bytes)
+    # The pipe stays non-inheritable: DUP2 gives the child an inheritable copy as its fd 1, and other processes
+    # spawned at the same time (from other threads) don't get the write end, which would keep the pipe open
+    read_fd, write_fd = os.pipe()
+    try:
+        pid = spawn(cmd, env, stdout=write_fd)
+    finally:
+        os.close(write_fd)  # otherwise we would never see the end of the output
+    chunks = []
+    with os.fdopen(read_fd, 'rb') as fo:
+        for chunk in iter(lambda: fo.read(65536), b''):
+            chunks.append(chunk)
+    return wait(pid), b''.join(chunks)
+
+# ------------------------------------- BENCHMARK -------------------------------------
+METHODS = {
+    'os.system': lambda: os.system('true'),
+    'Popen(shell=True)': lambda: subprocess.Popen('true', shell=True).wait(),
+    'Popen(list)': lambda: subprocess.Popen(['true']).wait(),
+    'posix_spawn': lambda: run(['true']),
+}
+
+def benchmark(rss_mb_list=(0, 1024, 4096), n=200):
+    """
+    Start 'true' n times with each method, while this process holds rss_mb MB of memory, and print the time per spawn.
+    """
+    print('parent RSS MB'.rjust(14) + ''.join(name.rjust(20) for name in METHODS))
+    ballast = None
+    for rss_mb in rss_mb_list:
+        ballast = None  # free the previous one first
+        ballast = bytearray(rss_mb * 1024 * 1024)
+        for i in range(0, len(ballast), 4096):
+            ballast[i] = 1  # touch every page, so the memory is really in use
+        row = f'{rss_mb:>14}'
+        for start_one in METHODS.values():
+            start = time.perf_counter()
+            for _ in range(n):
+                start_one()
+            row += f'{(time.perf_counter() - start) / n * 1000:>17.3f} ms'
+        print(row)
+    del ballast
+
+if __name__ == '__main__':
+    # python spawn_13.py [parent RSS in MB, ...]
+    benchmark([int(arg) for arg in sys.argv[1:]] or (0, 1024, 4096))
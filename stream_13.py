@@ -0,0 +1,49 @@
+"""
+Reading the output of a command line by line while it is still running (see Section_13.py)
+
+communicate() keeps the whole output in memory and only returns once the command has finished. For a command which
+prints gigabytes (e.g. 'ls -lthr' on a huge tree, or a log dump), that's a lot of memory and a long wait, even if
+the line we're after is the very first one.
+
+iter_lines() is a generator: it reads the pipe as the command writes to it and yields one decoded line at a time,
+so only one line is in memory at once. If we stop early (e.g. 'break' as in the bash version practice), the command
+is killed instead of being left to run to the end.
+https://docs.python.org/3/library/subprocess.html#subprocess.Popen.stdout
+"""
+
+import subprocess
+import sys
+
+import executor_13
+
+MAX_LINE = 1024 * 1024  # longer lines are returned in pieces of this size, to keep the memory bounded
+
+def iter_lines(cmd, stderr=None, encoding='utf-8', errors='replace', check=False, keepends=False, **kwargs):
+    """
+    Run cmd (a list, or a string for the shell) and yield the lines of its standard output as they arrive.
+    stderr: None (shown in the terminal), subprocess.DEVNULL or subprocess.STDOUT (mixed into the lines).
+    With check=True, subprocess.CalledProcessError is raised at the end if the command has failed.
+    Stopping the iteration early (break, or closing the generator) kills the command.
+    """
+    if stderr == subprocess.PIPE:
+        raise ValueError('stderr=PIPE is not read and could block the command; use DEVNULL or STDOUT')
+    proc = subprocess.Popen(cmd, shell=isinstance(cmd, str), stdout=subprocess.PIPE, stderr=stderr,
+                            start_new_session=True, **kwargs)
+    finished = False
+    try:
+        for raw in iter(lambda: proc.stdout.readline(MAX_LINE), b''):
+            line = raw.decode(encoding, errors)
+            yield line if keepends else line.rstrip('\r\n')
+        finished = True
+    finally:
+        if not finished:
+            executor_13.kill_group(proc)  # also kills whatever it has started, e.g. in a pipeline
+        proc.stdout.close()
+        returncode = proc.wait()
+    if check and returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
+
+if __name__ == '__main__':
+    # python stream_13.py <command> [args...]
+    for number, line in enumerate(iter_lines(sys.argv[1:]), 1):
+        print(f'{number:>8}: {line}')
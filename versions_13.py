@@ -0,0 +1,99 @@
+"""
+A cached version check for command line tools, based on the bash and java version practices in Section_13.py
+
+Starting 'java -version' takes hundreds of milliseconds, and checking dozens of tools before every job adds up.
+But the version of a tool can only change if its executable changes. So we remember the version together with:
+- the real path of the executable (after following symbolic links, e.g. /usr/bin/java -> /usr/lib/jvm/.../java)
+- its inode number, size and modification time
+If all of these are the same on the next run, the cached version is still valid and no process is started at all.
+The cache is kept in a JSON file, and all the tools which do need to be run are run at the same time (executor_13.py).
+"""
+
+import json
+import os
+import re
+import shutil
+import sys
+
+import executor_13
+import fileutil
+
+DEFAULT_CACHE = os.path.join(os.path.expanduser('~'), '.cache', 'tool_versions.json')
+# How to ask each tool for its version, if not with --version
+VERSION_ARGS = {
+    'java': ['-version'],  # prints to stderr, see Section_13.py
+    'javac': ['-version'],
+    'go': ['version'],
+    'ssh': ['-V'],
+}
+VERSION_RE = re.compile(r'(\d+(?:\.\d+)+)')
+
+def parse_version(output):
+    # The first x.y[.z...] number on the first line mentioning 'version', or else anywhere in the output
+    for line in output.splitlines():
+        if 'version' in line.lower():
+            match = VERSION_RE.search(line)
+            if match:
+                return match.group(1)
+    match = VERSION_RE.search(output)
+    return match.group(1) if match else None
+
+def binary_key(tool):
+    # (path found on $PATH, identity of the real executable), or (None, None) if the tool is not installed
+    path = shutil.which(tool)
+    if path is None:
+        return None, None
+    real = os.path.realpath(path)
+    st = os.stat(real)
+    return path, [real, st.st_ino, st.st_size, st.st_mtime_ns]
+
+class VersionCache:
+    def __init__(self, path=DEFAULT_CACHE, timeout=30, limit=16):
+        self.path = path
+        self.timeout = timeout
+        self.limit = limit
+        try:
+            with open(path) as fo:
+                self.cache = json.load(fo)
+        except (FileNotFoundError, ValueError):
+            self.cache = {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        fileutil.write_json(self.path, self.cache, indent=1)  # written atomically
+
+    def versions(self, tools):
+        """
+        Return {tool: version} for all tools (version is None if the tool is missing or no version was found).
+        Only tools whose executable has changed since the last call are actually run, all at the same time.
+        """
+        result, paths, keys, to_probe = {}, {}, {}, []
+        for tool in tools:
+            paths[tool], key = binary_key(tool)
+            keys[tool] = key
+            cached = self.cache.get(tool)
+            if key is None:
+                result[tool] = None
+            elif cached is not None and cached['key'] == key:
+                result[tool] = cached['version']
+            else:
+                to_probe.append(tool)
+
+        if to_probe:
+            # Run the executable found above, so the version belongs to exactly the file in the key
+            cmds = [[paths[tool], *VERSION_ARGS.get(tool, ['--version'])] for tool in to_probe]
+            for tool, res in zip(to_probe, executor_13.run_commands(cmds, self.limit, self.timeout)):
+                version = None if res.timed_out else parse_version(res.stdout + '\n' + res.stderr)
+                result[tool] = version
+                if version is not None:  # do not cache failures, they may be temporary
+                    self.cache[tool] = {'key': keys[tool], 'version': version}
+            self.save()
+        return {tool: result[tool] for tool in tools}
+
+def tool_versions(tools, path=DEFAULT_CACHE):
+    return VersionCache(path).versions(tools)
+
+if __name__ == '__main__':
+    # python versions_13.py bash java python3 ...
+    for tool, version in tool_versions(sys.argv[1:]).items():
+        print(f'{tool}: {version or "not found"}')
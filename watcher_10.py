@@ -0,0 +1,260 @@
+"""
+Keeping the file name index from fileindex_10.py up to date with Linux inotify
+
+index.refresh() still has to stat every directory in the tree. Instead, we can ask the kernel to tell us
+when something changes: inotify sends an event (e.g. 'file x was created in directory d') for every watched directory.
+https://man7.org/linux/man-pages/man7/inotify.7.html
+
+The inotify functions are not in the os module, so we call them from the C library with ctypes.
+https://docs.python.org/3/library/ctypes.html
+
+A busy build directory can produce thousands of events per second. Updating the index after every event would be
+wasteful, so the events are collected until things go quiet for a moment (or max_delay has passed), and then all
+the changed directories are listed again and the index is updated once. The update only writes the new listings of
+these directories to the index's small delta file (see FileIndex.update), so its cost depends on the size of the
+change, not of the tree; the full index is only rebuilt once the delta has grown large.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+
+import fileindex_10
+
+# Constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+DIR_EVENTS = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+
+EVENT = struct.Struct('iIII')  # struct inotify_event: wd, mask, cookie, len (followed by len bytes of name)
+
+_libc = None
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        _libc.inotify_init1.argtypes = [ctypes.c_int]
+        _libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        _libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return _libc
+
+def _check(result, path=None):
+    if result < 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err), path)
+    return result
+
+class Inotify:
+    # A thin wrapper around an inotify file descriptor
+    def __init__(self):
+        self.libc = _get_libc()
+        self.fd = _check(self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC))
+        self.poller = select.poll()
+        self.poller.register(self.fd, select.POLLIN)
+
+    def fileno(self):
+        return self.fd
+
+    def add_watch(self, path, mask):
+        # Returns the watch descriptor. Watching the same inode twice returns the same descriptor.
+        return _check(self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask), path)
+
+    def rm_watch(self, wd):
+        _check(self.libc.inotify_rm_watch(self.fd, wd))
+
+    def read_events(self, timeout=None):
+        """
+        Wait up to timeout seconds (forever if None) and return a list of (wd, mask, cookie, name) tuples.
+        The list is empty if nothing happened in the meantime.
+        """
+        if not self.poller.poll(None if timeout is None else int(timeout * 1000)):
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        pos = 0
+        while pos < len(data):
+            wd, mask, cookie, length = EVENT.unpack_from(data, pos)
+            pos += EVENT.size
+            name = data[pos:pos + length].rstrip(b'\0')
+            pos += length
+            events.append((wd, mask, cookie, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+class IndexWatcher:
+    """
+    Watch every directory in a FileIndex and update the index when files are created, removed or renamed.
+    Call process() in a loop (or just run()). Only the directories named in the events are listed again.
+    """
+    def __init__(self, index, delay=0.5, max_delay=5.0):
+        self.index = index
+        self.delay = delay
+        self.max_delay = max_delay
+        self.inotify = Inotify()
+        self.wd_paths = {}  # watch descriptor -> directory
+        self.path_wds = {}  # directory -> watch descriptor
+        self.root, self.dirs = index.load_dirs()
+        self._sync_watches()
+        # Something may have changed between building the index and adding the watches
+        self._resync()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.inotify.close()
+
+    def _watch(self, dirpath):
+        try:
+            wd = self.inotify.add_watch(dirpath, DIR_EVENTS | IN_ONLYDIR | IN_DONT_FOLLOW)
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                raise OSError(e.errno, 'Too many inotify watches, increase fs.inotify.max_user_watches') from e
+            return False  # the directory has disappeared in the meantime
+        self.wd_paths[wd] = dirpath
+        self.path_wds[dirpath] = wd
+        return True
+
+    def _unwatch(self, dirpath):
+        wd = self.path_wds.pop(dirpath, None)
+        if wd is not None and self.wd_paths.get(wd) == dirpath:
+            del self.wd_paths[wd]
+            try:
+                self.inotify.rm_watch(wd)
+            except OSError:
+                pass  # the kernel has already removed it together with the directory
+
+    def _sync_watches(self):
+        for dirpath in list(self.path_wds):
+            if dirpath not in self.dirs:
+                self._unwatch(dirpath)
+        for dirpath in self.dirs:
+            if dirpath not in self.path_wds:
+                self._watch(dirpath)
+
+    def _resync(self):
+        # Fall back to the mtime-based refresh, e.g. when the kernel event queue has overflowed
+        self.index.refresh()
+        self.root, self.dirs = self.index.load_dirs()
+        self._sync_watches()
+
+    def _add_tree(self, dirpath, changes):
+        # A new directory: watch it first and list it afterwards, so nothing created in between is missed
+        stack = [dirpath]
+        while stack:
+            path = stack.pop()
+            if not self._watch(path):
+                continue
+            listing = fileindex_10._list(path)
+            if listing is None:
+                self._unwatch(path)
+                continue
+            self.dirs[path] = changes[path] = listing
+            stack.extend(os.path.join(path, sub) for sub in listing[2])
+
+    def _drop_tree(self, dirpath, changes):
+        stack = [dirpath]
+        while stack:
+            path = stack.pop()
+            listing = self.dirs.pop(path, None)
+            self._unwatch(path)
+            if listing is not None:
+                changes[path] = None
+                stack.extend(os.path.join(path, sub) for sub in listing[2])
+
+    def _apply(self, dirty):
+        changes = {}  # directory -> new listing, or None if removed
+        added, removed = [], []
+        for dirpath in dirty:
+            old = self.dirs.get(dirpath)
+            if old is None:
+                continue  # inside a directory which has been removed
+            listing = fileindex_10._list(dirpath)
+            if listing is None:
+                removed.append(dirpath)
+                continue
+            self.dirs[dirpath] = changes[dirpath] = listing
+            old_subs, new_subs = set(old[2]), set(listing[2])
+            added.extend(os.path.join(dirpath, sub) for sub in new_subs - old_subs)
+            removed.extend(os.path.join(dirpath, sub) for sub in old_subs - new_subs)
+        # Drop before adding: a renamed directory keeps its inode, and so its watch descriptor
+        for dirpath in removed:
+            self._drop_tree(dirpath, changes)
+        for dirpath in added:
+            self._add_tree(dirpath, changes)
+        self.index.update(changes)
+
+    def process(self, timeout=None):
+        """
+        Wait up to timeout seconds for changes, collect the whole burst of events and update the index once.
+        Returns the number of directories which were listed again (0 if nothing has changed).
+        """
+        events = self.inotify.read_events(timeout)
+        if not events:
+            return 0
+        deadline = time.monotonic() + self.max_delay
+        dirty = set()
+        overflow = False
+        while events:
+            for wd, mask, cookie, name in events:
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                elif mask & IN_IGNORED:
+                    # The watch is gone (its directory was removed); the parent's event takes care of the index
+                    path = self.wd_paths.pop(wd, None)
+                    if path is not None and self.path_wds.get(path) == wd:
+                        del self.path_wds[path]
+                elif wd in self.wd_paths:
+                    dirty.add(self.wd_paths[wd])
+            remaining = min(self.delay, deadline - time.monotonic())
+            if remaining <= 0:
+                break
+            events = self.inotify.read_events(remaining)
+        if overflow:
+            self._resync()
+            return len(self.dirs)
+        if dirty:
+            self._apply(dirty)
+        return len(dirty)
+
+    def run(self):
+        while True:
+            changed = self.process()
+            if changed:
+                print(f'{time.strftime("%H:%M:%S")}: updated {changed} directories, {len(self.index)} files indexed')
+
+if __name__ == '__main__':
+    # python watcher_10.py <index_file>  (build the index first with fileindex_10.py)
+    with fileindex_10.FileIndex(sys.argv[1]) as index, IndexWatcher(index) as watcher:
+        watcher.run()